@@ -37,5 +37,74 @@ class Config(object):
     SPLITTING_THRESHOLD = os.environ.get('SPLITTING_THRESHOLD') or 10
     SPLITTING_THRESHOLD = int(SPLITTING_THRESHOLD)
 
+    # Cost model for the threshold: 'runtime' (estimated execution and hand-over cost in units of a simple statement)
+    # or 'lines' (number of lines), optionally with a JSON file overriding the cost table of the runtime cost model
+    COST_MODEL = os.environ.get('COST_MODEL') or 'runtime'
+    COST_TABLE = os.environ.get('COST_TABLE') or ''
+
+    # Placement of cuts between code blocks: 'greedy' (wherever the label changes) or 'optimal' (cuts minimizing the
+    # estimated cost of all parts, i.e., the overhead of each part, hand-over of variables and absorbed classical code)
+    PARTITIONING = os.environ.get('PARTITIONING') or 'greedy'
+
+    # Front-end used to parse and analyze scripts: 'redbaron' (full-fidelity tree) or 'ast' (lightweight IR)
+    ANALYSIS_FRONTEND = os.environ.get('ANALYSIS_FRONTEND') or 'redbaron'
+
+    # Number of worker processes used to label large scripts in shards of top level statements (1 to disable)
+    ANALYSIS_WORKERS = os.environ.get('ANALYSIS_WORKERS') or 1
+    ANALYSIS_WORKERS = int(ANALYSIS_WORKERS)
+    ANALYSIS_SHARD_SIZE = os.environ.get('ANALYSIS_SHARD_SIZE') or 500
+    ANALYSIS_SHARD_SIZE = int(ANALYSIS_SHARD_SIZE)
+
+    # Number of worker threads writing and zipping the files of the parts of a job concurrently (1 to disable)
+    SAVE_WORKERS = os.environ.get('SAVE_WORKERS') or 4
+    SAVE_WORKERS = int(SAVE_WORKERS)
+
+    # Cache for analysis results of previously split scripts: 'redis', 'disk' or empty to disable caching
+    ANALYSIS_CACHE = os.environ.get('ANALYSIS_CACHE') or ''
+    ANALYSIS_CACHE_FOLDER = os.environ.get('ANALYSIS_CACHE_FOLDER') or os.path.join(basedir, 'analysis_cache')
+    # Maximum size of all cached analysis results in bytes before least recently used entries are evicted
+    ANALYSIS_CACHE_MAX_SIZE = os.environ.get('ANALYSIS_CACHE_MAX_SIZE') or 64 * 1024 * 1024
+    ANALYSIS_CACHE_MAX_SIZE = int(ANALYSIS_CACHE_MAX_SIZE)
+
+    # Requirements of each part: 'full' (the complete requirements file of the script) or 'minimal' (only the
+    # requirements of the distributions providing the modules imported by the part, which misses optional dependencies
+    # unless they are declared in the 'distributions' of the knowledge base)
+    PART_REQUIREMENTS = os.environ.get('PART_REQUIREMENTS') or 'full'
+
+    # Run autoflake on the code of each part: 'on' (additionally remove unused imports within the extracted code) or
+    # 'off' (only add the imports of the script used by the part, which are selected while generating it)
+    AUTOFLAKE = os.environ.get('AUTOFLAKE') or 'off'
+
+    # Store of built parts shared by all jobs, so that parts identical to previously built ones are not shipped again:
+    # 'disk' or empty to disable it
+    ARTIFACT_STORE = os.environ.get('ARTIFACT_STORE') or ''
+    ARTIFACT_STORE_FOLDER = os.environ.get('ARTIFACT_STORE_FOLDER') or os.path.join(basedir, 'artifact_store')
+    # Maximum size of all stored artifacts in bytes before least recently used ones are evicted
+    ARTIFACT_STORE_MAX_SIZE = os.environ.get('ARTIFACT_STORE_MAX_SIZE') or 1024 * 1024 * 1024
+    ARTIFACT_STORE_MAX_SIZE = int(ARTIFACT_STORE_MAX_SIZE)
+    # Number of days after their last use before stored artifacts are evicted
+    ARTIFACT_STORE_MAX_AGE = os.environ.get('ARTIFACT_STORE_MAX_AGE') or 30
+    ARTIFACT_STORE_MAX_AGE = int(ARTIFACT_STORE_MAX_AGE)
+
+    # Hybrid for-loops whose quantum code does not depend on previous iterations: 'on' (execute all iterations in one
+    # part instead of one workflow iteration, i.e., one round trip, each) or 'off'
+    LOOP_BATCHING = os.environ.get('LOOP_BATCHING') or 'off'
+
+    # Classical code blocks which only compute JSON-serializable values using operators and a few builtins: 'on' (emit
+    # them as script tasks evaluated by the workflow engine instead of parts) or 'off'
+    SCRIPT_TASKS = os.environ.get('SCRIPT_TASKS') or 'off'
+
+    # Consecutive parts and script tasks which do not exchange any variables: 'on' (wrap them into parallel gateways of
+    # the workflow, which the workflow engine may execute concurrently) or 'off' (always execute them one after another)
+    PARALLEL_GATEWAYS = os.environ.get('PARALLEL_GATEWAYS') or 'off'
+
+    # Variables handed over between parts: 'liveness' (only variables read before being re-assigned) or 'usage'
+    # (all variables used in other code blocks)
+    HANDOFF_ANALYSIS = os.environ.get('HANDOFF_ANALYSIS') or 'liveness'
+
+    # Tracing of the phases of splitting jobs: 'on' (store timing spans with the result and export metrics), 'off', or
+    # 'debug' (additionally log debug output, e.g., dumps of all labels, which is expensive for large scripts)
+    TRACING = os.environ.get('TRACING') or 'on'
+
     # Clear upload and result folders first (for debugging purposes)
     CLEAR_FILES_ON_NEW_REQUEST = os.environ.get('CLEAR_FILES_ON_NEW_REQUEST') or False
@@ -0,0 +1,97 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import bisect
+
+from redis.exceptions import RedisError
+
+from app import app
+
+REDIS_PREFIX = 'qc-script-splitter:metrics:'
+
+# Upper bounds of the buckets of each histogram
+HISTOGRAMS = {
+    'qc_script_splitter_phase_duration_seconds': [0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 1800],
+    'qc_script_splitter_queue_wait_seconds': [0.1, 0.5, 1, 5, 10, 30, 60, 300, 1800],
+    'qc_script_splitter_script_size_bytes': [1000, 10000, 100000, 1000000, 10000000],
+    'qc_script_splitter_parts': [1, 2, 5, 10, 20, 50, 100],
+    'qc_script_splitter_output_size_bytes': [10000, 100000, 1000000, 10000000, 100000000],
+}
+
+HELP = {
+    'qc_script_splitter_phase_duration_seconds': 'Duration of the phases of splitting jobs',
+    'qc_script_splitter_queue_wait_seconds': 'Time splitting jobs wait in the queue before they are started',
+    'qc_script_splitter_script_size_bytes': 'Size of the split scripts',
+    'qc_script_splitter_parts': 'Number of parts a script is split into',
+    'qc_script_splitter_output_size_bytes': 'Size of the zipped script parts',
+}
+
+
+def format_labels(labels):
+    return ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for key, value in sorted(labels.items()))
+
+
+def observe(name, value, labels=None):
+    """Add a value to a histogram."""
+    observe_all([(name, value, labels)])
+
+
+def observe_all(observations):
+    """
+    Add the values of a list of (name, value, labels) tuples to their histograms in a single round trip. Histograms
+    are stored in Redis, so that the web application can expose the values observed by all workers. Values are dropped
+    if Redis is not available.
+    """
+    if not observations:
+        return
+    try:
+        pipeline = app.redis.pipeline()
+        for name, value, labels in observations:
+            key = REDIS_PREFIX + name + '{' + format_labels(labels or {}) + '}'
+            pipeline.sadd(REDIS_PREFIX + 'histograms', key)
+            pipeline.hincrby(key, bisect.bisect_left(HISTOGRAMS[name], value), 1)
+            pipeline.hincrbyfloat(key, 'sum', value)
+        pipeline.execute()
+    except RedisError as error:
+        app.logger.warning('Could not store %d metrics: %s' % (len(observations), error))
+
+
+def render():
+    """All histograms in the Prometheus text exposition format."""
+    histograms = {}
+    for key in sorted(app.redis.smembers(REDIS_PREFIX + 'histograms')):
+        key = key.decode('utf-8')
+        name, labels = key[len(REDIS_PREFIX):-1].split('{', 1)
+        if name in HISTOGRAMS:
+            histograms.setdefault(name, []).append((labels, app.redis.hgetall(key)))
+
+    lines = []
+    for name, buckets in HISTOGRAMS.items():
+        lines.append('# HELP %s %s' % (name, HELP[name]))
+        lines.append('# TYPE %s histogram' % name)
+        for labels, values in histograms.get(name, []):
+            separator = ',' if labels else ''
+            count = 0
+            for i, upper_bound in enumerate(buckets + ['+Inf']):
+                count += int(values.get(str(i).encode('utf-8'), 0))
+                lines.append('%s_bucket{%s%sle="%s"} %d' % (name, labels, separator, upper_bound, count))
+            lines.append('%s_sum{%s} %s' % (name, labels, float(values.get(b'sum', 0))))
+            lines.append('%s_count{%s} %d' % (name, labels, count))
+    return '\n'.join(lines) + '\n'
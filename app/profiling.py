@@ -0,0 +1,78 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import cProfile
+import contextlib
+import io
+import marshal
+import pstats
+import tracemalloc
+import zipfile
+
+# Number of functions and allocation sites listed in the human-readable reports
+TOP_ENTRIES = 50
+
+
+class Profile:
+    """CPU profile and allocation sites of a splitting job, packed as zip file to download with the result."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.snapshot = None
+        self.peak_memory = 0
+
+    @contextlib.contextmanager
+    def run(self):
+        tracemalloc.start()
+        self.profiler.enable()
+        try:
+            yield self
+        finally:
+            self.profiler.disable()
+            self.snapshot = tracemalloc.take_snapshot()
+            _, self.peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    def get_statistics(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+        return stream.getvalue()
+
+    def get_allocations(self):
+        statistics = self.snapshot.statistics('lineno')
+        lines = ['Peak of traced memory: %.1f KiB' % (self.peak_memory / 1024),
+                 'Top %d of %d allocation sites still allocated at the end of the job'
+                 % (min(TOP_ENTRIES, len(statistics)), len(statistics))]
+        for statistic in statistics[:TOP_ENTRIES]:
+            frame = statistic.traceback[0]
+            lines.append('%s:%d: %.1f KiB in %d blocks' % (frame.filename, frame.lineno, statistic.size / 1024,
+                                                            statistic.count))
+        return '\n'.join(lines) + '\n'
+
+    def to_zip(self):
+        """Zip file with the pstats dump, which can be loaded with pstats or snakeviz, and the text reports."""
+        self.profiler.create_stats()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr('profile.pstats', marshal.dumps(self.profiler.stats))
+            zip_file.writestr('profile.txt', self.get_statistics())
+            zip_file.writestr('allocations.txt', self.get_allocations())
+        return buffer.getvalue()
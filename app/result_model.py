@@ -17,7 +17,7 @@
 #  limitations under the License.
 # ******************************************************************************
 
-from sqlalchemy import LargeBinary
+from sqlalchemy import LargeBinary, Text
 from app import db
 
 
@@ -27,6 +27,10 @@ class Result(db.Model):
     agent = db.Column('agent', LargeBinary)
     error = db.Column(db.String(1200), default="")
     complete = db.Column(db.Boolean, default=False)
+    # Timing spans of the phases of the job as JSON
+    trace = db.Column('trace', Text)
+    # Zipped CPU profile and allocation sites of the job if profiling was requested
+    profile = db.Column('profile', LargeBinary)
 
     def __repr__(self):
         return 'Result {}'.format(self.complete)
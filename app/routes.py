@@ -17,11 +17,14 @@
 #  limitations under the License.
 # ******************************************************************************
 
-from app import app, db
+from app import app, db, metrics
 from app.result_model import Result
-from flask import jsonify, abort, request, send_from_directory, url_for
+from app.script_splitting.artifact_store import get_artifact_store
+from flask import jsonify, abort, request, send_from_directory, url_for, Response
+import json
 import logging
 import os
+import re
 import string
 import random
 import shutil
@@ -34,6 +37,12 @@ def split_qc_script():
     # Set splitting threshold if it is contained in request
     threshold = request.form.get('splitting_threshold', app.config['SPLITTING_THRESHOLD'])
 
+    # Reuse the initial labels and unchanged parts of a previous job if its id is contained in request
+    previous_job_id = request.form.get('previous_job_id', None)
+
+    # Profile the job if requested, e.g., to find out why splitting a script takes long
+    profile = request.form.get('profile', 'false').lower() == 'true'
+
     # Clear working directories
     if app.config['CLEAR_FILES_ON_NEW_REQUEST']:
         if os.path.exists(app.config['UPLOAD_FOLDER']):
@@ -67,7 +76,7 @@ def split_qc_script():
     app.logger.info('Knowledge base available via URL: ' + str(kb_url))
 
     # Execute job asynchronously
-    job = app.queue.enqueue('app.tasks.qc_script_splitting_task', qc_script_url=script_url, requirements_url=rq_url, knowledge_base_url=kb_url, threshold=threshold, job_timeout=18000)
+    job = app.queue.enqueue('app.tasks.qc_script_splitting_task', qc_script_url=script_url, requirements_url=rq_url, knowledge_base_url=kb_url, threshold=threshold, previous_job_id=previous_job_id, profile=profile, job_timeout=18000)
     app.logger.info('Added job for qc script splitting to the queue...')
     result = Result(id=job.get_id())
     db.session.add(result)
@@ -100,8 +109,13 @@ def get_result(result_id):
             with open(qc_script_parts, 'wb') as file:
                 file.write(result.program)
 
-            return jsonify({'id': result.id, 'complete': result.complete,
-                            'script_parts_url': url_for('download_generated_file', result_id=str(result_id))}), 200
+            response = {'id': result.id, 'complete': result.complete,
+                        'script_parts_url': url_for('download_generated_file', result_id=str(result_id))}
+            if result.trace:
+                response['trace'] = json.loads(result.trace)
+            if result.profile:
+                response['profile_url'] = url_for('download_profile', result_id=str(result_id))
+            return jsonify(response), 200
     else:
         return jsonify({'id': result.id, 'complete': result.complete}), 200
 
@@ -120,6 +134,37 @@ def download_generated_file(result_id):
     return send_from_directory(directory, file_name)
 
 
+@app.route('/qc-script-splitter/api/v1.0/results/<result_id>/profile', methods=['GET'])
+def download_profile(result_id):
+    """Return the zipped CPU profile and allocation sites of the job if it was profiled."""
+    result = Result.query.get(result_id)
+    if result is None or not result.complete or not result.profile:
+        abort(404)
+
+    directory = os.path.join(app.config["RESULT_FOLDER"], result.id)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    file_name = 'profile.zip'
+    with open(os.path.join(directory, file_name), 'wb') as file:
+        file.write(result.profile)
+    return send_from_directory(directory, file_name)
+
+
+@app.route('/qc-script-splitter/api/v1.0/artifacts/<artifact_hash>', methods=['GET'])
+def download_artifact(artifact_hash):
+    """Return a part built by a previous job, which is listed as cached in the artifacts.json of a result."""
+    artifact_store = get_artifact_store()
+    if artifact_store is None or not re.fullmatch(r'[0-9a-f]{64}', artifact_hash):
+        abort(404)
+    return send_from_directory(artifact_store.folder, artifact_hash + '.zip')
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Return histograms of the phase durations, queue wait time, and sizes of all jobs in the Prometheus format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/qc-script-splitter/api/v1.0/version', methods=['GET'])
 def version():
     return jsonify({'version': '1.0'})
@@ -0,0 +1,188 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import hashlib
+import json
+import os
+import time
+
+from app import app
+from app.script_splitting.Labels import Labels
+from app.script_splitting.cost_model import cost_model_version
+from app.script_splitting.splitting_context import CodeBlocks
+
+# Increase whenever the serialized format or the analysis changes in a way that invalidates cached entries
+CACHE_FORMAT_VERSION = 4
+
+REDIS_PREFIX = 'qc-script-splitter:analysis:'
+
+
+def cache_key(script, knowledge_base_json, threshold):
+    """Content-addressed key of the analysis of a script with the given knowledge base and threshold."""
+    knowledge_base_version = json.dumps(knowledge_base_json, sort_keys=True)
+    content = '\0'.join([str(CACHE_FORMAT_VERSION), app.config['ANALYSIS_FRONTEND'], str(threshold),
+                         cost_model_version(), app.config['PARTITIONING'], app.config['LOOP_BATCHING'],
+                         knowledge_base_version, script])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def labeled_nodes(script):
+    """Iterate over all labeled nodes in the order they are labeled by the ScriptAnalyzer."""
+    for node in script:
+        yield node
+        if node.type == 'ifelseblock':
+            for block in node.value:
+                yield from labeled_nodes(block.value)
+        elif node.type in ['while', 'for']:
+            yield from labeled_nodes(node.value)
+
+
+def serialize_analysis(script, labels, code_blocks):
+    nodes = list(labeled_nodes(script))
+    index = {id(node): i for i, node in enumerate(nodes)}
+    return json.dumps({
+        'labels': [labels[node].name if node in labels else None for node in nodes],
+        'code_blocks': [[index[id(node)] for node in code_block] for code_block in code_blocks]
+    })
+
+
+def deserialize_analysis(script, entry):
+    nodes = list(labeled_nodes(script))
+    data = json.loads(entry)
+    if len(data['labels']) != len(nodes):
+        app.logger.warning('Cached analysis does not match the parsed script... Ignore it')
+        return None
+    labels = {node: Labels[label] for node, label in zip(nodes, data['labels']) if label is not None}
+    code_blocks = CodeBlocks([nodes[i] for i in code_block] for code_block in data['code_blocks'])
+    return labels, code_blocks
+
+
+class DiskAnalysisCache:
+    """Analysis cache storing one file per entry. Least recently used entries are evicted first."""
+
+    def __init__(self, folder, max_size):
+        self.folder = folder
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def get(self, key):
+        path = os.path.join(self.folder, key + '.json')
+        try:
+            with open(path, 'r') as file:
+                entry = file.read()
+            # Modification time is used as last access time for the LRU eviction
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = os.path.join(self.folder, key + '.json')
+        with open(path + '.tmp', 'w') as file:
+            file.write(entry)
+        os.replace(path + '.tmp', path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            app.logger.debug('Evict %s from analysis cache' % name)
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                pass
+            total_size -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class RedisAnalysisCache:
+    """Analysis cache shared by all workers via Redis. Least recently used entries are evicted first."""
+
+    def __init__(self, redis, max_size):
+        self.redis = redis
+        self.max_size = max_size
+
+    def get(self, key):
+        entry = self.redis.get(REDIS_PREFIX + key)
+        if entry is None:
+            self.redis.incr(REDIS_PREFIX + 'misses')
+            return None
+        self.redis.incr(REDIS_PREFIX + 'hits')
+        self.redis.zadd(REDIS_PREFIX + 'lru', {key: time.time()})
+        return entry.decode('utf-8')
+
+    def put(self, key, entry):
+        pipeline = self.redis.pipeline()
+        pipeline.set(REDIS_PREFIX + key, entry)
+        pipeline.zadd(REDIS_PREFIX + 'lru', {key: time.time()})
+        pipeline.hset(REDIS_PREFIX + 'sizes', key, len(entry))
+        pipeline.execute()
+        self.evict()
+
+    def evict(self):
+        sizes = self.redis.hgetall(REDIS_PREFIX + 'sizes')
+        total_size = sum(int(size) for size in sizes.values())
+        while total_size > self.max_size:
+            oldest = self.redis.zrange(REDIS_PREFIX + 'lru', 0, 0)
+            if not oldest:
+                break
+            key = oldest[0].decode('utf-8')
+            app.logger.debug('Evict %s from analysis cache' % key)
+            pipeline = self.redis.pipeline()
+            pipeline.delete(REDIS_PREFIX + key)
+            pipeline.zrem(REDIS_PREFIX + 'lru', key)
+            pipeline.hdel(REDIS_PREFIX + 'sizes', key)
+            pipeline.execute()
+            total_size -= int(sizes.get(oldest[0], 0))
+
+    def stats(self):
+        hits, misses = self.redis.mget(REDIS_PREFIX + 'hits', REDIS_PREFIX + 'misses')
+        return {'hits': int(hits or 0), 'misses': int(misses or 0)}
+
+
+analysis_cache = None
+
+
+def get_analysis_cache():
+    """Return the configured analysis cache or None if caching is disabled."""
+    global analysis_cache
+    if analysis_cache is None:
+        if app.config['ANALYSIS_CACHE'] == 'redis':
+            analysis_cache = RedisAnalysisCache(app.redis, app.config['ANALYSIS_CACHE_MAX_SIZE'])
+        elif app.config['ANALYSIS_CACHE'] == 'disk':
+            analysis_cache = DiskAnalysisCache(app.config['ANALYSIS_CACHE_FOLDER'], app.config['ANALYSIS_CACHE_MAX_SIZE'])
+    return analysis_cache
@@ -0,0 +1,145 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import hashlib
+import os
+import time
+import zipfile
+
+import autoflake
+
+from app import app
+from app.script_splitting.template_engine import DOCKERFILE
+
+# Increase whenever the layout of the generated parts changes in a way that invalidates stored artifacts
+ARTIFACT_FORMAT_VERSION = 1
+
+# Timestamp and permissions of all files in generated zips, so that identical contents result in identical zips
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644
+
+
+def write_deterministic_zip(zip_file, directory_path, base_path):
+    """Add all files in the directory in sorted order with fixed timestamps and permissions to the zip file."""
+    for root, dirs, files in os.walk(directory_path):
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            info = zipfile.ZipInfo(os.path.relpath(path, base_path), date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = ZIP_FILE_MODE << 16
+            with open(path, 'rb') as content:
+                zip_file.writestr(info, content.read())
+
+
+def artifact_hash(part):
+    """Deterministic hash of everything the built part, i.e., its Dockerfile and zipped service, is generated from."""
+    code = '\n'.join(node.dumps() for node in part['app.py'])
+    content = '\0'.join([str(ARTIFACT_FORMAT_VERSION), app.config['AUTOFLAKE'], autoflake.__version__, code, part['requirements.txt'],
+                         part['polling_agent.py'], DOCKERFILE.render()])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class DiskArtifactStore:
+    """
+    Store of built parts shared by all jobs, with one zip file per part. Artifacts which were not used for the
+    configured number of days are evicted, and least recently used artifacts are evicted first if the store is full.
+    Artifacts listed as cached by a result are pinned for the configured number of days, so that they can be
+    downloaded as long as the result is not expired, even if the store exceeds its maximum size.
+    """
+
+    def __init__(self, folder, max_size, max_age_days):
+        self.folder = folder
+        self.max_size = max_size
+        self.max_age = max_age_days * 24 * 60 * 60
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def get_path(self, key):
+        return os.path.join(self.folder, key + '.zip')
+
+    def get_pin_path(self, key):
+        return os.path.join(self.folder, key + '.pin')
+
+    def contains(self, key):
+        """Whether the artifact is stored, if so, it is pinned as it is listed as cached by the result of the job."""
+        try:
+            # Modification time is used as last access time for the eviction
+            os.utime(self.get_path(key))
+        except OSError:
+            return False
+        with open(self.get_pin_path(key), 'a'):
+            pass
+        os.utime(self.get_pin_path(key))
+        return True
+
+    def is_pinned(self, key, oldest_allowed):
+        try:
+            return os.stat(self.get_pin_path(key)).st_mtime >= oldest_allowed
+        except OSError:
+            return False
+
+    def put(self, key, part_directory):
+        path = self.get_path(key)
+        with zipfile.ZipFile(path + '.tmp', 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            write_deterministic_zip(zip_file, part_directory, part_directory)
+        os.replace(path + '.tmp', path)
+        self.evict()
+
+    def remove(self, key):
+        app.logger.debug('Evict %s from artifact store' % key)
+        for path in [self.get_path(key), self.get_pin_path(key)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.zip'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-len('.zip')]))
+        total_size = sum(size for _, size, _ in entries)
+        oldest_allowed = time.time() - self.max_age
+        for mtime, size, key in sorted(entries):
+            if self.is_pinned(key, oldest_allowed):
+                continue
+            if mtime < oldest_allowed or total_size > self.max_size:
+                self.remove(key)
+                total_size -= size
+        if total_size > self.max_size:
+            app.logger.warning('Artifact store exceeds its maximum size by artifacts listed as cached by results')
+
+
+artifact_store = None
+
+
+def get_artifact_store():
+    """Return the configured artifact store or None if it is disabled."""
+    global artifact_store
+    if artifact_store is None and app.config['ARTIFACT_STORE'] == 'disk':
+        artifact_store = DiskArtifactStore(app.config['ARTIFACT_STORE_FOLDER'], app.config['ARTIFACT_STORE_MAX_SIZE'],
+                                           app.config['ARTIFACT_STORE_MAX_AGE'])
+    return artifact_store
@@ -0,0 +1,223 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import hashlib
+import json
+import re
+
+from app import app
+from app.script_splitting.liveness import KILLING_ASSIGNMENT
+from app.script_splitting.name_index import NameIndex, get_names
+
+# Estimated execution cost of calls in units of a simple statement, e.g., 'x = 1'. Calls are matched by the longest
+# prefix of their dotted path after resolving imports, e.g., 'np.linalg.eigh' is matched by 'numpy.linalg'
+CALL_COSTS = {
+    'numpy': 1,
+    'numpy.linalg': 50,
+    'numpy.fft': 20,
+    'numpy.random': 2,
+    'scipy': 20,
+    'scipy.linalg': 50,
+    'scipy.optimize': 200,
+    'pandas': 5,
+    'matplotlib': 5,
+    'qiskit.visualization': 5,
+    'sklearn': 100,
+    'torch': 100,
+    'math': 0,
+    'fractions': 0,
+    'print': 0,
+    'len': 0,
+    'range': 0,
+    'int': 0,
+    'float': 0,
+    'str': 0,
+}
+# Cost of calls which are not found in the table, e.g., methods or functions of the script
+DEFAULT_CALL_COST = 1
+
+# Estimated size of values handed over between parts in units of a scalar, by the call creating the value
+TRANSFER_SIZES = {
+    'numpy': 50,
+    'pandas': 50,
+    'scipy': 50,
+    'torch': 50,
+    'qiskit': 20,
+}
+DEFAULT_TRANSFER_SIZE = 1
+
+# Overhead of an additional part, i.e., starting its service, polling the task and returning its results
+PART_OVERHEAD = 5
+# Cost of handing over a value of size 1 from one part to another
+TRANSFER_COST = 0.1
+# Number of iterations assumed for loops if the number of iterations is unknown
+LOOP_ITERATIONS = 10
+
+CALL = re.compile(r'(?<![\w.])([A-Za-z_]\w*(?:\s*\.\s*[A-Za-z_]\w*)*)\s*\(')
+STRING = re.compile(r'\'(?:\\.|[^\'\\])*\'|"(?:\\.|[^"\\])*"')
+RANGE_LITERAL = re.compile(r'\s*range\(\s*(\d+)\s*\)\s*$')
+
+
+def calc_weight(node):
+    weight = 1
+    if node.type == 'ifelseblock':
+        for block in node.value:
+            weight -= 1
+            for x in block.value:
+                weight += calc_weight(x)
+    if node.type in ['while', 'for']:
+        weight -= 1
+        for block in node.value:
+            weight += calc_weight(block)
+    return weight
+
+
+class LineCostModel:
+    """Every statement costs 1 and splitting is free, i.e., the threshold is the number of classical lines."""
+
+    part_overhead = PART_OVERHEAD
+
+    def statement_cost(self, node):
+        return calc_weight(node)
+
+    def handoff_cost(self, nodes):
+        return 0
+
+    def is_below_threshold(self, nodes, threshold):
+        """True if the classical nodes are too cheap to be executed in a separate part."""
+        cost = sum(self.statement_cost(node) for node in nodes)
+        return 0 < cost < threshold
+
+
+class RuntimeCostModel(LineCostModel):
+    """
+    Estimates the execution cost of statements from the calls they contain and the cost of executing classical nodes
+    in a separate part from the overhead of the part and the size of the variables handed over to and from it.
+    The threshold is given in units of a simple statement and only compared with the execution cost, whereas the
+    overhead of parts and hand-overs is weighed by the optimal partitioning.
+    """
+
+    def __init__(self, script, symbol_table, table=None):
+        table = table or {}
+        self.call_costs = dict(CALL_COSTS, **table.get('call_costs', {}))
+        self.transfer_sizes = dict(TRANSFER_SIZES, **table.get('transfer_sizes', {}))
+        self.part_overhead = table.get('part_overhead', PART_OVERHEAD)
+        self.transfer_cost = table.get('transfer_cost', TRANSFER_COST)
+        self.loop_iterations = table.get('loop_iterations', LOOP_ITERATIONS)
+        self.script = script
+        self.symbol_table = symbol_table
+        self.name_index = None
+        self.sizes = None
+        self.costs = {}
+
+    def resolve(self, call):
+        """Dotted path of the called function with the name bound by an import replaced by the imported module."""
+        path = [part.strip() for part in call.split('.')]
+        if path[0] in self.symbol_table.as_imports:
+            return self.symbol_table.as_imports[path[0]] + path[1:]
+        if path[0] in self.symbol_table.from_imports:
+            return [str(part) for part in self.symbol_table.from_imports[path[0]]] + path[1:]
+        return path
+
+    def lookup(self, table, path, default):
+        for i in range(len(path), 0, -1):
+            value = table.get('.'.join(path[:i]))
+            if value is not None:
+                return value
+        return default
+
+    def get_calls(self, node):
+        return [self.resolve(call) for call in CALL.findall(STRING.sub('', node.dumps()))]
+
+    def statement_cost(self, node):
+        # Code blocks are estimated again for every enclosing code block, thus, remember their costs
+        cost = self.costs.get(id(node))
+        if cost is None:
+            cost = self.estimate_cost(node)
+            self.costs[id(node)] = cost
+        return cost
+
+    def estimate_cost(self, node):
+        if node.type == 'ifelseblock':
+            # Only one of the branches is executed
+            return 1 + max(sum(self.statement_cost(x) for x in block.value) for block in node.value)
+        if node.type in ['while', 'for']:
+            iterations = self.loop_iterations
+            if node.type == 'for':
+                match = RANGE_LITERAL.match(node.target.dumps())
+                if match:
+                    iterations = int(match.group(1))
+            return 1 + iterations * sum(self.statement_cost(x) for x in node.value)
+        if node.type in ['def', 'class']:
+            # The body is executed where the function is called
+            return 1
+        return 1 + sum(self.lookup(self.call_costs, path, DEFAULT_CALL_COST) for path in self.get_calls(node))
+
+    def transfer_size(self, value_node):
+        return max([self.lookup(self.transfer_sizes, path, DEFAULT_TRANSFER_SIZE) for path in self.get_calls(value_node)],
+                   default=DEFAULT_TRANSFER_SIZE)
+
+    def get_assignments(self, nodes):
+        """Names assigned by the nodes and the values assigned to them, including assignments in nested code blocks."""
+        for node in nodes:
+            if node.type == 'ifelseblock':
+                for block in node.value:
+                    yield from self.get_assignments(block.value)
+            elif node.type in ['while', 'for']:
+                yield from self.get_assignments(node.value)
+            elif node.type == 'assignment':
+                match = KILLING_ASSIGNMENT.match(node.dumps())
+                if match:
+                    yield match.group(1), node.value
+
+    def handoff_cost(self, nodes):
+        """Cost of handing over variables to and from a part consisting of the given nodes."""
+        if self.name_index is None:
+            self.name_index = NameIndex(self.script)
+            self.sizes = {}
+            for name, value in self.get_assignments(self.script):
+                self.sizes[name] = max(self.sizes.get(name, 0), self.transfer_size(value))
+
+        # Variables assigned outside and read by the nodes as well as variables assigned by the nodes and read outside
+        assigned = list(dict.fromkeys(name for name, _ in self.get_assignments(nodes)))
+        used = set().union(*(get_names(node) for node in nodes))
+        handed_over = (used & self.sizes.keys()) - set(assigned)
+        handed_over.update(self.name_index.used_outside(assigned, nodes))
+
+        return self.transfer_cost * sum(self.sizes[name] for name in handed_over)
+
+
+def load_cost_table():
+    if not app.config['COST_TABLE']:
+        return {}
+    with open(app.config['COST_TABLE'], 'r') as file:
+        return json.load(file)
+
+
+def get_cost_model(script, symbol_table):
+    """Cost model configured by COST_MODEL: 'runtime' (estimated execution and hand-over cost) or 'lines'."""
+    if app.config['COST_MODEL'] == 'lines':
+        return LineCostModel()
+    return RuntimeCostModel(script, symbol_table, load_cost_table())
+
+
+def cost_model_version():
+    """Identifies the configured cost model, e.g., to invalidate cached labels if it changes."""
+    return hashlib.sha256(json.dumps([app.config['COST_MODEL'], load_cost_table()], sort_keys=True).encode('utf-8')) \
+        .hexdigest()
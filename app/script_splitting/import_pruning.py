@@ -0,0 +1,81 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import ast
+
+from app import app
+from app.script_splitting.script_ir import GeneratedCode
+
+
+def parse_import(node):
+    """Python ast of the import statement of the given node or None if it cannot be parsed on its own."""
+    try:
+        tree = ast.parse(node.dumps().strip())
+    except SyntaxError:
+        return None
+    if len(tree.body) != 1 or not isinstance(tree.body[0], (ast.Import, ast.ImportFrom)):
+        return None
+    return tree.body[0]
+
+
+def bound_name(statement, alias):
+    """Name bound by the alias of an import, e.g., 'np' for 'import numpy as np' and 'qiskit' for 'import qiskit.x'."""
+    if alias.asname:
+        return alias.asname
+    if isinstance(statement, ast.Import):
+        return alias.name.split('.')[0]
+    return alias.name
+
+
+def alias_source(alias):
+    return alias.name + (' as ' + alias.asname if alias.asname else '')
+
+
+class ImportPruner:
+    """
+    Selects the import statements of a script needed by a part, i.e., the imports binding names used in its code block.
+    Statements importing several names are reduced to the used names, e.g., 'from qiskit import Aer, execute' to
+    'from qiskit import execute'. Star imports, future imports, and imports which cannot be analyzed are always kept.
+    """
+
+    def __init__(self, import_nodes):
+        self.imports = [(node, parse_import(node)) for node in import_nodes]
+
+    def prune(self, used_names):
+        result = []
+        for node, statement in self.imports:
+            if statement is None or (isinstance(statement, ast.ImportFrom) and statement.module == '__future__') \
+                    or any(alias.name == '*' for alias in statement.names):
+                result.append(node)
+                continue
+
+            used_aliases = [alias for alias in statement.names if bound_name(statement, alias) in used_names]
+            if len(used_aliases) == len(statement.names):
+                result.append(node)
+            elif used_aliases:
+                names = ', '.join(alias_source(alias) for alias in used_aliases)
+                if isinstance(statement, ast.Import):
+                    result.append(GeneratedCode('import ' + names))
+                else:
+                    result.append(GeneratedCode('from ' + '.' * statement.level + (statement.module or '') +
+                                                ' import ' + names))
+
+        app.logger.debug('Imports needed by the part: %s', result)
+        return result
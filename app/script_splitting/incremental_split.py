@@ -0,0 +1,170 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import difflib
+import hashlib
+import json
+import os
+import re
+
+from app import app
+from app.script_splitting.Labels import Labels
+from app.script_splitting.analysis_cache import CACHE_FORMAT_VERSION, labeled_nodes
+from app.script_splitting.name_index import get_names
+
+SNAPSHOT_SUFFIX = '.snapshot.json'
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def context_hash(script, knowledge_base_json, threshold):
+    """Hash of everything besides the statement itself which influences its initial labels."""
+    imports = [node.dumps() for node in script.find_all('import')] + \
+              [node.dumps() for node in script.find_all('from_import')]
+    return content_hash('\0'.join([str(CACHE_FORMAT_VERSION), app.config['ANALYSIS_FRONTEND'], str(threshold),
+                                   json.dumps(knowledge_base_json, sort_keys=True)] + imports))
+
+
+def used_names(node):
+    """All strings the ScriptAnalyzer may look up in the list of quantum objects when labeling the node."""
+    names = get_names(node)
+    # RedBaron returns the first character for the left-most identifier of name values
+    return set(names) | {name[0] for name in names if name}
+
+
+def snapshot_path(job_id):
+    # Job ids are provided by clients, thus, do not allow to leave the result folder
+    if job_id is None or not re.fullmatch(r'[A-Za-z0-9_-]+', job_id):
+        return None
+    return os.path.join(app.config["RESULT_FOLDER"], job_id + SNAPSHOT_SUFFIX)
+
+
+def load_snapshot(job_id):
+    path = snapshot_path(job_id)
+    if path is None or not os.path.exists(path):
+        app.logger.warning('No analysis snapshot found for job %s... Split from scratch' % job_id)
+        return None
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def save_snapshot(job_id, snapshot):
+    path = snapshot_path(job_id)
+    if path is None:
+        return
+    if not os.path.exists(app.config["RESULT_FOLDER"]):
+        os.makedirs(app.config["RESULT_FOLDER"])
+    with open(path, 'w') as file:
+        json.dump(snapshot, file)
+
+
+def get_initial_labels(script_analyzer, script, context, previous_snapshot=None):
+    """
+    Label the top level statements one after another. The initial labels of statements which are unchanged since the
+    previous snapshot are reused if the quantum objects they depend on are unchanged, too.
+    Returns the labels and the snapshot entries of all top level statements.
+    """
+    statements = list(script)
+    hashes = [content_hash(node.dumps()) for node in statements]
+
+    # Align unchanged statements of the new script with the statements of the previous script
+    previous_statements = {}
+    if previous_snapshot is not None and previous_snapshot['context'] == context:
+        previous_hashes = [statement['hash'] for statement in previous_snapshot['statements']]
+        matcher = difflib.SequenceMatcher(None, previous_hashes, hashes, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                for offset in range(i2 - i1):
+                    previous_statements[j1 + offset] = previous_snapshot['statements'][i1 + offset]
+
+    labels = {}
+    entries = []
+    quantum_objects = {quantum_object for quantum_object in script_analyzer.context.quantum_objects
+                       if isinstance(quantum_object, str)}
+    reused = 0
+    for i, node in enumerate(statements):
+        used = sorted(quantum_objects & used_names(node))
+        previous = previous_statements.get(i)
+        nodes = list(labeled_nodes([node]))
+        if previous is not None and previous['used'] == used and len(previous['labels']) == len(nodes):
+            for labeled_node, label in zip(nodes, previous['labels']):
+                labels[labeled_node] = Labels[label]
+            added = previous['quantum_objects']
+            script_analyzer.context.quantum_objects.extend(added)
+            reused += 1
+        else:
+            number_of_quantum_objects = len(script_analyzer.context.quantum_objects)
+            statement_labels = script_analyzer.get_initial_labels([node])
+            labels.update(statement_labels)
+            added = [quantum_object for quantum_object in script_analyzer.context.quantum_objects[number_of_quantum_objects:]
+                     if isinstance(quantum_object, str)]
+        quantum_objects.update(added)
+        entries.append(snapshot_entry(hashes[i], nodes, labels, added, used))
+
+    app.logger.info('Reused initial labels of %d of %d statements' % (reused, len(statements)))
+    return labels, entries
+
+
+def snapshot_entry(statement_hash, nodes, labels, quantum_objects, used):
+    return {'hash': statement_hash, 'labels': [labels[node].name for node in nodes],
+            'quantum_objects': quantum_objects, 'used': used}
+
+
+def snapshot_entries(script, labels):
+    """Snapshot entries of all top level statements for initial labels which were not computed statement-wise."""
+    entries = []
+    quantum_objects = set()
+    for node in script:
+        used = sorted(quantum_objects & used_names(node))
+        nodes = list(labeled_nodes([node]))
+        added = [labeled_node.target.value for labeled_node in nodes
+                 if labeled_node.type == 'assignment' and labels[labeled_node] == Labels.QUANTUM
+                 and isinstance(labeled_node.target.value, str)]
+        quantum_objects.update(added)
+        entries.append(snapshot_entry(content_hash(node.dumps()), nodes, labels, added, used))
+    return entries
+
+
+def part_hash(part):
+    return content_hash('\n'.join(x.dumps() for x in part['app.py']) + '\0' + part['requirements.txt'])
+
+
+def reuse_unchanged_parts(script_parts, previous_snapshot):
+    """
+    Mark parts which are identical to parts of the previous job as reusable, so that their files are copied from the
+    previous result instead of being generated again. Parts are named by their content, thus, they keep their names.
+    """
+    previous_parts = {}
+    if previous_snapshot is not None:
+        for part in previous_snapshot['parts']:
+            previous_parts[part['name']] = part['hash']
+
+    reused = 0
+    parts = []
+    for part in script_parts['extracted_parts']:
+        part_content_hash = part_hash(part)
+        if previous_parts.get(part['name']) == part_content_hash:
+            part['reused_from'] = os.path.join(previous_snapshot['directory'], part['name'])
+            reused += 1
+        parts.append({'name': part['name'], 'hash': part_content_hash})
+
+    app.logger.info('Reused %d of %d parts' % (reused, len(script_parts['extracted_parts'])))
+    return parts
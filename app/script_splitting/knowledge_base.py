@@ -0,0 +1,117 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import json
+
+from app import app
+
+# Number of compiled knowledge bases kept per process
+MAX_COMPILED_KNOWLEDGE_BASES = 16
+
+
+class TrieNode:
+    __slots__ = ['children', 'decision', 'members_decision']
+
+    def __init__(self):
+        self.children = {}
+        # Decision for the module or symbol of this node and everything below it, e.g., 'qiskit'
+        self.decision = None
+        # Decision for everything below this node but not the node itself, e.g., 'qiskit.visualization.*'
+        self.members_decision = None
+
+
+class KnowledgeBaseMatcher:
+    """
+    Prefix trie compiled from the white and black list of a knowledge base.
+
+    A rule matches the module or symbol it names and everything contained in it, a rule ending with '.*' matches
+    everything contained in the named module but not the module itself. The most specific matching rule decides if a
+    module or symbol is quantum, i.e., 'qiskit.visualization' on the black list overrides 'qiskit' on the white list.
+    If the same rule is on both lists, the black list wins. Without any matching rule, it is not quantum.
+    """
+
+    def __init__(self, white_list, black_list):
+        self.root = TrieNode()
+        self.number_of_rules = 0
+        self.lookups = 0
+        self.allowed = 0
+        for rule in white_list or []:
+            self.add_rule(rule, True)
+        for rule in black_list or []:
+            self.add_rule(rule, False)
+
+    def add_rule(self, rule, allow):
+        parts = rule.split('.')
+        members_only = parts[-1] == '*'
+        if members_only:
+            parts = parts[:-1]
+
+        node = self.root
+        for part in parts:
+            node = node.children.setdefault(part, TrieNode())
+
+        if members_only:
+            node.members_decision = allow if node.members_decision is None else node.members_decision and allow
+        else:
+            node.decision = allow if node.decision is None else node.decision and allow
+        self.number_of_rules += 1
+
+    def is_quantum(self, module_path):
+        """Return True if the most specific rule matching the given list of module path elements is white-listed."""
+        self.lookups += 1
+        decision = None
+        node = self.root
+        for part in module_path:
+            if node.members_decision is not None:
+                decision = node.members_decision
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.decision is not None:
+                decision = node.decision
+
+        if decision:
+            self.allowed += 1
+        return decision is True
+
+    def stats(self, since=None):
+        """
+        Lookups since the matcher was compiled or, as matchers are shared by the jobs of a process, since the given
+        earlier result of this method, e.g., taken when a job started.
+        """
+        lookups = self.lookups - (since['lookups'] if since is not None else 0)
+        allowed = self.allowed - (since['allowed'] if since is not None else 0)
+        return {'rules': self.number_of_rules, 'lookups': lookups, 'allowed': allowed, 'denied': lookups - allowed}
+
+
+compiled_knowledge_bases = {}
+
+
+def get_knowledge_base_matcher(white_list, black_list):
+    """Return the compiled matcher for the given white and black list. Each version is only compiled once."""
+    version = json.dumps([white_list, black_list])
+    matcher = compiled_knowledge_bases.get(version)
+    if matcher is None:
+        if len(compiled_knowledge_bases) >= MAX_COMPILED_KNOWLEDGE_BASES:
+            compiled_knowledge_bases.clear()
+        matcher = KnowledgeBaseMatcher(white_list, black_list)
+        compiled_knowledge_bases[version] = matcher
+        app.logger.debug('Compiled knowledge base with %d rules' % matcher.number_of_rules)
+    return matcher
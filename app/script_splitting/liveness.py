@@ -0,0 +1,302 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import ast
+import re
+import symtable
+import textwrap
+
+from app.script_splitting.Labels import Labels
+from app.script_splitting.name_index import get_names
+
+# Assignment of a plain name which overwrites the previous value, e.g., 'x = ...' but not 'x += ...' or 'x[0] = ...'
+KILLING_ASSIGNMENT = re.compile(r'\s*([A-Za-z_][A-Za-z0-9_]*)\s*=(?!=)')
+
+
+def get_read_names(node):
+    """Names used in the node, except for names which only occur as attributes, e.g., 'result' in 'job.result()'."""
+    text = node.dumps()
+    return frozenset(name for name in get_names(node) if re.search(r'(?<![\w.])' + re.escape(name) + r'(?!\w)', text))
+
+
+def get_global_names(node):
+    """Names a function or class definition reads from the script when it is defined or called."""
+    try:
+        table = symtable.symtable(textwrap.dedent(node.dumps()), '<part>', 'exec')
+    except SyntaxError:
+        return get_read_names(node)
+    names = {symbol.get_name() for symbol in table.get_symbols() if symbol.is_referenced()}
+    tables = table.get_children()
+    while tables:
+        table = tables.pop()
+        names.update(symbol.get_name() for symbol in table.get_symbols() if symbol.is_global() and symbol.is_referenced())
+        tables.extend(table.get_children())
+    return frozenset(names)
+
+
+class Summary:
+    """Names a piece of code reads before (re-)assigning them and names it assigns on every path through it."""
+    __slots__ = ['gen', 'kill']
+
+    def __init__(self, gen=frozenset(), kill=frozenset()):
+        self.gen = gen
+        self.kill = kill
+
+    def live_in(self, live_out):
+        return self.gen | (live_out - self.kill)
+
+
+def summarize_statement(node):
+    if node.type == 'ifelseblock':
+        return summarize_branches([(get_test_names(block), summarize_statements(block.value)) for block in node.value])
+    if node.type in ['while', 'for']:
+        return summarize_loop(get_test_names(node), summarize_statements(node.value))
+    if node.type in ['def', 'class']:
+        return Summary(get_global_names(node))
+    if node.type == 'assignment':
+        match = KILLING_ASSIGNMENT.match(node.dumps())
+        if match:
+            return Summary(get_read_names(node.value), frozenset([match.group(1)]))
+    return Summary(get_read_names(node))
+
+
+def summarize_statements(nodes):
+    return summarize_sequence([summarize_statement(node) for node in nodes])
+
+
+def summarize_sequence(summaries):
+    gen = set()
+    kill = set()
+    for summary in reversed(summaries):
+        gen = summary.gen | (gen - summary.kill)
+        kill |= summary.kill
+    return Summary(frozenset(gen), frozenset(kill))
+
+
+def summarize_loop(test_names, body):
+    # The body might not be executed at all, thus, it does not kill any names
+    return Summary(test_names | body.gen)
+
+
+def summarize_branches(branches):
+    gen = frozenset().union(*((test_names or frozenset()) | branch.gen for test_names, branch in branches))
+    # Names are only killed if they are killed by every branch and one of the branches is always executed
+    kill = frozenset()
+    if has_else(branches):
+        kill = frozenset.intersection(*(branch.kill for _, branch in branches))
+    return Summary(gen, kill)
+
+
+def has_else(branches):
+    return branches[-1][0] is None
+
+
+def get_test_names(node):
+    """Names read by the condition of a loop or branch, which is evaluated by the workflow engine."""
+    if node.type == 'else':
+        return None
+    test = node.target if node.type == 'for' else node.test
+    return get_read_names(test)
+
+
+def get_target_names(target):
+    """Names of the variables assigned or modified by assigning to the target, e.g., 'x' for 'x[0]' or 'x.y'."""
+    while isinstance(target, (ast.Attribute, ast.Subscript, ast.Starred)):
+        target = target.value
+    if isinstance(target, ast.Name):
+        return {target.id}
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return set().union(*(get_target_names(element) for element in target.elts))
+    return set()
+
+
+def get_loop_variables(node):
+    """Names assigned by the header of a for-loop, e.g., 'i' and 'x' for 'for i, x in enumerate(values):'."""
+    try:
+        statement = ast.parse(textwrap.dedent(node.dumps()).strip()).body[0]
+    except SyntaxError:
+        return get_names(node)
+    return get_target_names(statement.target)
+
+
+def get_assigned_names(nodes):
+    """
+    Names the nodes may assign or modify on any path through them, including targets of augmented assignments and
+    assignments to subscripts or attributes, and objects whose methods are called for their side effects, e.g., 'qc'
+    for 'qc.h(0)'.
+    """
+    names = set()
+    for node in nodes:
+        if node.type == 'ifelseblock':
+            for block in node.value:
+                names.update(get_assigned_names(block.value))
+            continue
+        if node.type in ['while', 'for']:
+            if node.type == 'for':
+                names.update(get_loop_variables(node))
+            names.update(get_assigned_names(node.value))
+            continue
+        if node.type in ['comment', 'endl']:
+            continue
+        try:
+            statements = ast.parse(textwrap.dedent(node.dumps()).strip()).body
+        except SyntaxError:
+            names.update(get_names(node))
+            continue
+        for statement in statements:
+            if isinstance(statement, ast.Assign):
+                for target in statement.targets:
+                    names.update(get_target_names(target))
+            elif isinstance(statement, (ast.AugAssign, ast.AnnAssign)):
+                names.update(get_target_names(statement.target))
+            elif isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call):
+                names.update(get_target_names(statement.value.func.value)
+                             if isinstance(statement.value.func, ast.Attribute) else set())
+            elif isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(statement.name)
+            elif isinstance(statement, (ast.Import, ast.ImportFrom)):
+                names.update((alias.asname or alias.name).split('.')[0] for alias in statement.names)
+            elif isinstance(statement, ast.Delete):
+                for target in statement.targets:
+                    names.update(get_target_names(target))
+    return names
+
+
+def get_loop_carried_names(node):
+    """Names an iteration of the loop may read before assigning them, which were assigned by a previous iteration."""
+    return summarize_statements(node.value).gen & get_assigned_names(node.value)
+
+
+class LivenessAnalysis:
+    """
+    Backward liveness analysis of the split program, i.e., the workflow of parts, hybrid loops and hybrid if-else-blocks.
+    A variable is live after a part if it may be read by a later part or workflow condition before it is re-assigned.
+    """
+
+    def __init__(self, script, splitting_labels, code_blocks):
+        self.splitting_labels = splitting_labels
+        self.code_blocks = code_blocks
+        self.block_of = code_blocks.block_of
+        self.parts = {}
+        self.loop_bodies = {}
+        self.live_out = {}
+        self.defined_in = {}
+        # Indices of the code blocks in the order their parts are added to the workflow
+        self.order = []
+
+        self.workflow = self.get_workflow(script, set())
+        self.summarize(self.workflow)
+        self.propagate(self.workflow, frozenset())
+
+    def get_workflow(self, nodes, visited_blocks):
+        """Parts, hybrid loops and hybrid if-else-blocks in the order they are added to the workflow."""
+        workflow = []
+        for node in nodes:
+            if id(node) in self.block_of:
+                i = self.block_of[id(node)]
+                if i not in visited_blocks:
+                    visited_blocks.add(i)
+                    self.order.append(i)
+                    workflow.append(('part', i))
+            elif self.splitting_labels.get(node) == Labels.LOOP:
+                workflow.append(('loop', get_test_names(node), self.get_workflow(node.value, visited_blocks)))
+            elif self.splitting_labels.get(node) == Labels.IF_ELSE_BLOCK:
+                workflow.append(('branches', [(get_test_names(block), self.get_workflow(block.value, visited_blocks))
+                                              for block in node.value]))
+        return workflow
+
+    def summarize(self, workflow):
+        summaries = []
+        for item in workflow:
+            if item[0] == 'part':
+                summary = summarize_statements(self.code_blocks[item[1]])
+                self.parts[item[1]] = summary
+            elif item[0] == 'loop':
+                body = self.summarize(item[2])
+                self.loop_bodies[id(item[2])] = body
+                summary = summarize_loop(item[1], body)
+            else:
+                summary = summarize_branches([(test_names, self.summarize(branch)) for test_names, branch in item[1]])
+            summaries.append(summary)
+        return summarize_sequence(summaries)
+
+    def propagate(self, workflow, live_out):
+        """Compute the names live after each part, returns the names live before the given workflow."""
+        live = live_out
+        for item in reversed(workflow):
+            if item[0] == 'part':
+                self.live_out[item[1]] = live
+                live = self.parts[item[1]].live_in(live)
+            elif item[0] == 'loop':
+                # Names read in any iteration of the loop are live at the head of the loop
+                live = item[1] | self.loop_bodies[id(item[2])].gen | live
+                self.propagate(item[2], live)
+            else:
+                live_after = live
+                # Without else branch, the workflow may continue without executing any branch
+                live = frozenset() if has_else(item[1]) else live_after
+                for test_names, branch in item[1]:
+                    live = live | (test_names or frozenset()) | self.propagate(branch, live_after)
+        return live
+
+    def compute_defined(self, return_variables):
+        """
+        Forward analysis of the names returned by parts which may be executed before each part, given the return
+        variables of each code block by its index. Only these names can be handed over to a part by the workflow.
+        """
+        self.define(self.workflow, frozenset(), return_variables)
+
+    def define(self, workflow, defined, return_variables):
+        """Record the names defined before each part, returns the names defined after the given workflow."""
+        for item in workflow:
+            if item[0] == 'part':
+                self.defined_in[item[1]] = defined
+                defined = defined | return_variables[item[1]]
+            elif item[0] == 'loop':
+                # Parts of the body may have been executed by previous iterations
+                defined = self.define(item[2], defined | self.get_returned(item[2], return_variables),
+                                      return_variables)
+            else:
+                defined = defined.union(*(self.define(branch, defined, return_variables) for _, branch in item[1]))
+        return defined
+
+    def get_returned(self, workflow, return_variables):
+        returned = set()
+        for item in workflow:
+            if item[0] == 'part':
+                returned.update(return_variables[item[1]])
+            elif item[0] == 'loop':
+                returned.update(self.get_returned(item[2], return_variables))
+            else:
+                for _, branch in item[1]:
+                    returned.update(self.get_returned(branch, return_variables))
+        return returned
+
+    def get_defined_in(self, code_block):
+        """Names returned by a part which may be executed before the part of the code block."""
+        return self.defined_in[self.block_of[id(code_block[0])]]
+
+    def get_live_in(self, code_block, return_variables):
+        """Names the part of the code block reads before assigning them, including returned names it may not assign."""
+        return self.parts[self.block_of[id(code_block[0])]].live_in(frozenset(return_variables))
+
+    def get_live_out(self, code_block):
+        """Names which may be read after the part of the code block before they are re-assigned."""
+        return self.live_out[self.block_of[id(code_block[0])]]
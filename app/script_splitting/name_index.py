@@ -0,0 +1,71 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import bisect
+
+from app.script_splitting.script_ir import is_ir
+
+
+def get_names(node):
+    """Set of all names used in the node, i.e., all values for which node.find_all('NameNode', value=...) matches."""
+    if is_ir(node):
+        return node.names()
+    return {name.value for name in node.find_all('name')}
+
+
+class NameIndex:
+    """
+    Inverted index from names to the statements of a script reading or writing them. Statements are numbered in the
+    order they are executed, code blocks (ifs, whiles, etc.) are represented by the range of their nested statements.
+    """
+
+    def __init__(self, script):
+        self.occurrences = {}
+        self.ranges = {}
+        self.number_of_statements = 0
+        self.add_statements(script)
+
+    def add_statements(self, nodes):
+        for node in nodes:
+            start = self.number_of_statements
+            if node.type == "ifelseblock":
+                for block in node.value:
+                    self.add_statements(block.value)
+            elif node.type in ['while', 'for']:
+                self.add_statements(node.value)
+            else:
+                for name in get_names(node):
+                    self.occurrences.setdefault(name, []).append(start)
+                self.number_of_statements += 1
+            self.ranges[id(node)] = (start, self.number_of_statements)
+
+    def used_outside(self, variables, nodes):
+        """Variables used by any statement outside of the given nodes, ordered by their first use."""
+        excluded = sorted(self.ranges[id(node)] for node in nodes if id(node) in self.ranges)
+        starts = [start for start, _ in excluded]
+
+        first_uses = []
+        for i, variable in enumerate(variables):
+            for statement in self.occurrences.get(variable, []):
+                j = bisect.bisect_right(starts, statement) - 1
+                if j < 0 or statement >= excluded[j][1]:
+                    first_uses.append((statement, i, variable))
+                    break
+        return [variable for _, _, variable in sorted(first_uses)]
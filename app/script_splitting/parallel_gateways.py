@@ -0,0 +1,132 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+from app import app
+
+# Steps of the workflow executing code, i.e., parts and script tasks, which may run concurrently if data-independent
+CODE_STEPS = ['task', 'script']
+# Steps opening and closing nested sequences of steps, and steps separating the branches of if-else-blocks
+OPENING_STEPS = ['start_while', 'start_for', 'start_if', 'parallel_start']
+CLOSING_STEPS = ['end_while', 'end_for', 'end_if', 'parallel_end']
+BRANCH_STEPS = ['else_if', 'else']
+
+
+def depends_on(step, previous_step, interfaces):
+    """
+    Whether the step has to be executed after the previous step, i.e., if it reads a variable the previous step
+    writes, writes a variable the previous step reads, or both write the same variable.
+    """
+    parameters, return_variables = interfaces[id(step)]
+    previous_parameters, previous_return_variables = interfaces[id(previous_step)]
+    return not previous_return_variables.isdisjoint(parameters) \
+        or not return_variables.isdisjoint(previous_parameters) \
+        or not return_variables.isdisjoint(previous_return_variables)
+
+
+def schedule(steps, interfaces):
+    """Group consecutive code steps into stages, each of which only contains steps independent of each other."""
+    levels = []
+    for j, step in enumerate(steps):
+        levels.append(max((levels[i] + 1 for i in range(j) if depends_on(step, steps[i], interfaces)), default=0))
+    stages = [[] for _ in range(max(levels, default=-1) + 1)]
+    for level, step in zip(levels, steps):
+        stages[level].append(step)
+    return stages
+
+
+def parallelize(workflow, interfaces):
+    """
+    Wrap data-independent consecutive parts and script tasks of the workflow into parallel gateways, i.e., between a
+    'parallel_start' and a 'parallel_end' step, all of whose steps may be executed concurrently. The interfaces map
+    the id of each code step to its parameters and return variables.
+    """
+    result = []
+    steps = []
+
+    def flush():
+        for stage in schedule(steps, interfaces):
+            if len(stage) == 1:
+                result.extend(stage)
+            else:
+                result.append({"type": "parallel_start"})
+                result.extend(stage)
+                result.append({"type": "parallel_end"})
+        steps.clear()
+
+    for step in workflow:
+        if step['type'] in CODE_STEPS:
+            steps.append(step)
+        else:
+            # Loops and branches are evaluated by the workflow engine and, thus, separate the sequences of steps
+            flush()
+            result.append(step)
+    flush()
+    return result
+
+
+def critical_path_length(workflow):
+    """
+    Number of code steps on the longest path through the workflow, assuming the steps of each parallel gateway are
+    executed concurrently. Loops are counted with their path through one iteration.
+    """
+    def sequence(i):
+        # Length of the sequence starting at index i and the index of the step ending it
+        length = 0
+        while i < len(workflow) and workflow[i]['type'] not in CLOSING_STEPS + BRANCH_STEPS:
+            step_type = workflow[i]['type']
+            if step_type in CODE_STEPS:
+                length += 1
+                i += 1
+            elif step_type == 'parallel_start':
+                parallel_length, i = parallel(i + 1)
+                length += parallel_length
+            elif step_type in OPENING_STEPS:
+                # Branches of if-else-blocks continue until the closing step, loops only consist of their body
+                branch_length, i = sequence(i + 1)
+                while i < len(workflow) and workflow[i]['type'] in BRANCH_STEPS:
+                    other_length, i = sequence(i + 1)
+                    branch_length = max(branch_length, other_length)
+                length += branch_length
+                i += 1
+            else:
+                i += 1
+        return length, i
+
+    def parallel(i):
+        length = 0
+        while i < len(workflow) and workflow[i]['type'] != 'parallel_end':
+            if workflow[i]['type'] in CODE_STEPS:
+                length = max(length, 1)
+            i += 1
+        return length, i + 1
+
+    return sequence(0)[0]
+
+
+def critical_path_report(sequential_workflow, parallel_workflow):
+    """Critical path of the workflow before and after introducing parallel gateways."""
+    report = {
+        'sequential': critical_path_length(sequential_workflow),
+        'parallel': critical_path_length(parallel_workflow),
+        'parallel_gateways': sum(1 for step in parallel_workflow if step['type'] == 'parallel_start')
+    }
+    app.logger.info('Critical path of the workflow: %s tasks sequentially, %s tasks with %s parallel gateways'
+                    % (report['sequential'], report['parallel'], report['parallel_gateways']))
+    return report
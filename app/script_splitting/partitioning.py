@@ -0,0 +1,72 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+from app import app
+from app.script_splitting.Labels import Labels
+
+# Maximum number of label runs merged into one part, bounds the time to partition long sequences of statements
+MAX_RUNS_PER_PART = 64
+
+
+def partition(code_block, cut_points, splitting_labels, cost_model, threshold):
+    """
+    Split the code block at the subset of the possible cut points which minimizes the estimated cost of the resulting
+    parts, i.e., the overhead of each part, the hand-over of variables between the parts, and the execution of
+    classical code absorbed by quantum parts. Absorbing classical code with the cost of the threshold costs as much
+    as the overhead of a part.
+    """
+    offsets = [0] + cut_points + [len(code_block)]
+    number_of_runs = len(offsets) - 1
+    absorption = cost_model.part_overhead / threshold if threshold > 0 else float('inf')
+
+    # Cost of the classical statements of each run and whether it contains quantum statements
+    classical_costs = []
+    quantum_runs = []
+    for i in range(number_of_runs):
+        run = code_block[offsets[i]:offsets[i + 1]]
+        classical_costs.append(sum(cost_model.statement_cost(node) for node in run
+                                   if splitting_labels.get(node) == Labels.CLASSICAL))
+        quantum_runs.append(any(splitting_labels.get(node) == Labels.QUANTUM for node in run))
+
+    # Minimal cost of partitioning the first j runs and the first run of the last part for each j
+    best = [(0, 0)]
+    for j in range(1, number_of_runs + 1):
+        candidates = []
+        classical_cost = 0
+        quantum = False
+        for i in range(j - 1, max(j - MAX_RUNS_PER_PART, 0) - 1, -1):
+            classical_cost += classical_costs[i]
+            quantum = quantum or quantum_runs[i]
+            cost = best[i][0] + cost_model.part_overhead + cost_model.handoff_cost(code_block[offsets[i]:offsets[j]])
+            if quantum and classical_cost > 0:
+                cost += absorption * classical_cost
+            candidates.append((cost, i))
+        best.append(min(candidates))
+
+    # Collect the parts of the optimal partition from back to front
+    code_blocks = []
+    j = number_of_runs
+    while j > 0:
+        i = best[j][1]
+        code_blocks.insert(0, code_block[offsets[i]:offsets[j]])
+        j = i
+
+    app.logger.debug('Partitioned %d runs into %d parts with estimated cost %s'
+                     % (number_of_runs, len(code_blocks), best[-1][0]))
+    return code_blocks
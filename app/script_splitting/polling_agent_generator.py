@@ -17,44 +17,37 @@
 #  limitations under the License.
 # ******************************************************************************
 from app import app
-import os
+from app.script_splitting.template_engine import POLLING_AGENT
 import random
 import string
 
 
-def generate_polling_agent(parameters, return_values):
-    # Read from polling agent template
-    polling_agent_template_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates", "polling_agent_template.py")
-    with open(polling_agent_template_path, "r") as template:
-        content = template.read()
-
-    # generate random name for the polling agent and replace placeholder
-    pollingAgentName = ''.join(random.choices(string.ascii_uppercase + string.digits, k=12))
-    content = content.replace("$ServiceNamePlaceholder", pollingAgentName)
+def generate_polling_agent(parameters, return_values, pollingAgentName=None):
+    # generate random name for the polling agent if none is given
+    if pollingAgentName is None:
+        pollingAgentName = ''.join(random.choices(string.ascii_uppercase + string.digits, k=12))
 
     # handle variable retrieval for input data
-    load_data_str = ''
     app.logger.debug('Number of input parameters: %d' % len(parameters))
+    load_data = []
     for inputParameter in parameters:
-        load_data_str += '\n'
-        load_data_str += '                    if variables.get("' + inputParameter + '").get("type").casefold() in ["string", "long", "double", "boolean"]:\n'
-        load_data_str += '                        print("Input Parameter ' + inputParameter + ' (basic type)")\n'
-        load_data_str += '                        ' + inputParameter + ' = variables.get("' + inputParameter + '").get("value")\n'
-        load_data_str += '                        print("...value: %s" % ' + inputParameter + ')\n'
-        load_data_str += '                    else:\n'
-        load_data_str += '                        print("Input Parameter ' + inputParameter + ' (pickle)")\n'
-        load_data_str += '                        ' + inputParameter + ' = download_data(camundaEndpoint + "/process-instance/" + externalTask.get("processInstanceId") + "/variables/' + inputParameter + '/data")\n'
-        load_data_str += '                        print("...downloaded value: %s" % ' + inputParameter + ')\n'
-        load_data_str += '                        ' + inputParameter + ' = pickle.loads(' + inputParameter + ')\n'
-        load_data_str += '                        print("...decoded value: %s" % ' + inputParameter + ')\n'
-
-    content = content.replace("### LOAD INPUT DATA ###", load_data_str)
+        load_data.extend([
+            '\n',
+            '                    if variables.get("', inputParameter, '").get("type").casefold() in ["string", "long", "double", "boolean"]:\n',
+            '                        print("Input Parameter ', inputParameter, ' (basic type)")\n',
+            '                        ', inputParameter, ' = variables.get("', inputParameter, '").get("value")\n',
+            '                        print("...value: %s" % ', inputParameter, ')\n',
+            '                    else:\n',
+            '                        print("Input Parameter ', inputParameter, ' (pickle)")\n',
+            '                        ', inputParameter, ' = download_data(camundaEndpoint + "/process-instance/" + externalTask.get("processInstanceId") + "/variables/', inputParameter, '/data")\n',
+            '                        print("...downloaded value: %s" % ', inputParameter, ')\n',
+            '                        ', inputParameter, ' = pickle.loads(', inputParameter, ')\n',
+            '                        print("...decoded value: %s" % ', inputParameter, ')\n'])
 
     call_str = ", ".join(return_values)
     if len(return_values) > 0:
         call_str += " = "
     call_str += "app.main(" + ", ".join(parameters) + ")"
-    content = content.replace("### CALL SCRIPT PART ###", call_str)
 
     # handle output
     '''
@@ -73,33 +66,38 @@ def generate_polling_agent(parameters, return_values):
         }
     }
     '''
-    outputHandler = '\n'
-    outputHandler += '                    body = {"workerId": "' + pollingAgentName + '"}\n'
-    outputHandler += '                    body["variables"] = {}\n'
+    outputHandler = [
+        '\n',
+        '                    body = {"workerId": "', pollingAgentName, '"}\n',
+        '                    body["variables"] = {}\n']
     for outputParameter in return_values:
         # encode output parameter as file to circumvent the Camunda size restrictions on strings
-        outputHandler += '\n'
-        outputHandler += '                    if isinstance(' + outputParameter + ', str):\n'
-        outputHandler += '                        print("OutputParameter (string) %s" % ' + outputParameter + ')\n'
-        outputHandler += '                        body["variables"]["' + outputParameter + '"] = {"value": ' + outputParameter + ', "type": "string"}\n'
-        outputHandler += '                    elif isinstance(' + outputParameter + ', int):\n'
-        outputHandler += '                        print("OutputParameter (int) %s" % ' + outputParameter + ')\n'
-        outputHandler += '                        body["variables"]["' + outputParameter + '"] = {"value": ' + outputParameter + ', "type": "long"}\n'
-        outputHandler += '                    elif isinstance(' + outputParameter + ', float):\n'
-        outputHandler += '                        print("OutputParameter (float) %s" % ' + outputParameter + ')\n'
-        outputHandler += '                        body["variables"]["' + outputParameter + '"] = {"value": ' + outputParameter + ', "type": "double"}\n'
-        outputHandler += '                    elif isinstance(' + outputParameter + ', bool):\n'
-        outputHandler += '                        print("OutputParameter (bool) %s" % ' + outputParameter + ')\n'
-        outputHandler += '                        body["variables"]["' + outputParameter + '"] = {"value": ' + outputParameter + ', "type": "boolean"}\n'
-        outputHandler += '                    else:\n'
-        outputHandler += '                        try:\n'
-        outputHandler += '                            print("Encode OutputParameter %s" % ' + outputParameter + ')\n'
-        outputHandler += '                            encoded_' + outputParameter + ' = base64.b64encode(pickle.dumps(' + outputParameter + ')).decode()\n'
-        outputHandler += '                            print("Encoded: %s" % encoded_' + outputParameter + ')\n'
-        outputHandler += '                            body["variables"]["' + outputParameter + '"] = {"value": encoded_' + outputParameter + ', "type": "File", "valueInfo": {"filename": "' + outputParameter + '", "encoding": "utf-8"}}\n'
-        outputHandler += '                        except Exception as err:\n'
-        outputHandler += '                            print("Could not pickle %s" % err)\n'
-        outputHandler += '                    print("body: %s" % body)'
+        outputHandler.extend([
+            '\n',
+            '                    if isinstance(', outputParameter, ', str):\n',
+            '                        print("OutputParameter (string) %s" % ', outputParameter, ')\n',
+            '                        body["variables"]["', outputParameter, '"] = {"value": ', outputParameter, ', "type": "string"}\n',
+            '                    elif isinstance(', outputParameter, ', int):\n',
+            '                        print("OutputParameter (int) %s" % ', outputParameter, ')\n',
+            '                        body["variables"]["', outputParameter, '"] = {"value": ', outputParameter, ', "type": "long"}\n',
+            '                    elif isinstance(', outputParameter, ', float):\n',
+            '                        print("OutputParameter (float) %s" % ', outputParameter, ')\n',
+            '                        body["variables"]["', outputParameter, '"] = {"value": ', outputParameter, ', "type": "double"}\n',
+            '                    elif isinstance(', outputParameter, ', bool):\n',
+            '                        print("OutputParameter (bool) %s" % ', outputParameter, ')\n',
+            '                        body["variables"]["', outputParameter, '"] = {"value": ', outputParameter, ', "type": "boolean"}\n',
+            '                    else:\n',
+            '                        try:\n',
+            '                            print("Encode OutputParameter %s" % ', outputParameter, ')\n',
+            '                            encoded_', outputParameter, ' = base64.b64encode(pickle.dumps(', outputParameter, ')).decode()\n',
+            '                            print("Encoded: %s" % encoded_', outputParameter, ')\n',
+            '                            body["variables"]["', outputParameter, '"] = {"value": encoded_', outputParameter, ', "type": "File", "valueInfo": {"filename": "', outputParameter, '", "encoding": "utf-8"}}\n',
+            '                        except Exception as err:\n',
+            '                            print("Could not pickle %s" % err)\n',
+            '                    print("body: %s" % body)'])
 
-    # remove the placeholder
-    return content.replace("### STORE OUTPUT DATA SECTION ###", outputHandler)
+    # fill the placeholders of the template
+    return POLLING_AGENT.render({"$ServiceNamePlaceholder": pollingAgentName,
+                                 "### LOAD INPUT DATA ###": ''.join(load_data),
+                                 "### CALL SCRIPT PART ###": call_str,
+                                 "### STORE OUTPUT DATA SECTION ###": ''.join(outputHandler)})
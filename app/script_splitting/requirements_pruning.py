@@ -0,0 +1,188 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import ast
+import re
+import textwrap
+
+from app import app
+
+# Distributions providing top level modules whose name differs from the name of the distribution, several
+# distributions are listed if the module is split into several distributions, e.g., qiskit
+DISTRIBUTIONS = {
+    'qiskit': ['qiskit', 'qiskit-terra', 'qiskit-aer', 'qiskit-ibmq-provider', 'qiskit-ignis'],
+    'qiskit_machine_learning': ['qiskit-machine-learning'],
+    'qiskit_nature': ['qiskit-nature'],
+    'qiskit_optimization': ['qiskit-optimization'],
+    'qiskit_finance': ['qiskit-finance'],
+    'sklearn': ['scikit-learn'],
+    'skimage': ['scikit-image'],
+    'cv2': ['opencv-python', 'opencv-python-headless'],
+    'PIL': ['Pillow'],
+    'yaml': ['PyYAML'],
+    'bs4': ['beautifulsoup4'],
+    'dateutil': ['python-dateutil'],
+    'dotenv': ['python-dotenv'],
+    'google': ['protobuf'],
+    'attr': ['attrs'],
+    'Crypto': ['pycryptodome'],
+    'jwt': ['PyJWT'],
+    'mpl_toolkits': ['matplotlib'],
+    'pylab': ['matplotlib'],
+}
+
+# Top level modules of the standard library of Python 3.7 to 3.11, which are not installed from the requirements
+STDLIB_MODULES = frozenset([
+    '__future__', 'abc', 'aifc', 'antigravity', 'argparse', 'array', 'ast', 'asynchat', 'asyncio', 'asyncore', 'atexit',
+    'audioop', 'base64', 'bdb', 'binascii', 'binhex', 'bisect', 'builtins', 'bz2', 'cProfile', 'calendar', 'cgi',
+    'cgitb', 'chunk', 'cmath', 'cmd', 'code', 'codecs', 'codeop', 'collections', 'colorsys', 'compileall', 'concurrent',
+    'configparser', 'contextlib', 'contextvars', 'copy', 'copyreg', 'crypt', 'csv', 'ctypes', 'curses', 'dataclasses',
+    'datetime', 'dbm', 'decimal', 'difflib', 'dis', 'distutils', 'doctest', 'dummy_threading', 'email', 'encodings',
+    'ensurepip', 'enum', 'errno', 'faulthandler', 'fcntl', 'filecmp', 'fileinput', 'fnmatch', 'formatter', 'fractions',
+    'ftplib', 'functools', 'gc', 'genericpath', 'getopt', 'getpass', 'gettext', 'glob', 'graphlib', 'grp', 'gzip',
+    'hashlib', 'heapq', 'hmac', 'html', 'http', 'idlelib', 'imaplib', 'imghdr', 'imp', 'importlib', 'inspect', 'io',
+    'ipaddress', 'itertools', 'json', 'keyword', 'lib2to3', 'linecache', 'locale', 'logging', 'lzma', 'macpath',
+    'mailbox', 'mailcap', 'marshal', 'math', 'mimetypes', 'mmap', 'modulefinder', 'msilib', 'msvcrt', 'multiprocessing',
+    'netrc', 'nis', 'nntplib', 'nt', 'ntpath', 'nturl2path', 'numbers', 'opcode', 'operator', 'optparse', 'os',
+    'ossaudiodev', 'parser', 'pathlib', 'pdb', 'pickle', 'pickletools', 'pipes', 'pkgutil', 'platform', 'plistlib',
+    'poplib', 'posix', 'posixpath', 'pprint', 'profile', 'pstats', 'pty', 'pwd', 'py_compile', 'pyclbr', 'pydoc',
+    'pydoc_data', 'pyexpat', 'queue', 'quopri', 'random', 're', 'readline', 'reprlib', 'resource', 'rlcompleter',
+    'runpy', 'sched', 'secrets', 'select', 'selectors', 'shelve', 'shlex', 'shutil', 'signal', 'site', 'smtpd',
+    'smtplib', 'sndhdr', 'socket', 'socketserver', 'spwd', 'sqlite3', 'sre_compile', 'sre_constants', 'sre_parse',
+    'ssl', 'stat', 'statistics', 'string', 'stringprep', 'struct', 'subprocess', 'sunau', 'symbol', 'symtable', 'sys',
+    'sysconfig', 'syslog', 'tabnanny', 'tarfile', 'telnetlib', 'tempfile', 'termios', 'textwrap', 'this', 'threading',
+    'time', 'timeit', 'tkinter', 'token', 'tokenize', 'tomllib', 'trace', 'traceback', 'tracemalloc', 'tty', 'turtle',
+    'turtledemo', 'types', 'typing', 'unicodedata', 'unittest', 'urllib', 'uu', 'uuid', 'venv', 'warnings', 'wave',
+    'weakref', 'webbrowser', 'winreg', 'winsound', 'wsgiref', 'xdrlib', 'xml', 'xmlrpc', 'zipapp', 'zipfile',
+    'zipimport', 'zlib', 'zoneinfo'
+])
+
+# Requirements of modules used by the generated services which are installed if the requirements file of the script
+# does not provide them, e.g., the version of qiskit the services were written for
+DEFAULT_REQUIREMENTS = {
+    'qiskit': 'qiskit==0.32.1',
+}
+
+# Name of the distribution a line of a requirements file refers to, e.g., 'qiskit' for 'qiskit[visualization]>=0.32'
+REQUIREMENT_NAME = re.compile(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[.*\])?\s*([<>=!~;@]|$)')
+
+
+def normalize(distribution):
+    return re.sub(r'[-_.]+', '-', distribution).lower()
+
+
+def get_imported_modules(code):
+    """Top level modules imported anywhere in the code or None if the code cannot be parsed."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.add(node.module.split('.')[0])
+    return modules
+
+
+def get_requirement_names(requirements):
+    """Normalized distribution names of the lines of the requirements file, None for lines like '--index-url'."""
+    names = []
+    for line in requirements.splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = REQUIREMENT_NAME.match(line)
+        if line.lstrip().startswith('-') or match is None:
+            names.append((None, line))
+        else:
+            names.append((normalize(match.group(1)), line))
+    return names
+
+
+def add_default_requirements(requirements, modules=None, distributions=DISTRIBUTIONS):
+    """
+    Requirements file with the default requirements of the given modules, or of all modules if None, appended if it
+    does not provide the modules.
+    """
+    listed = set(name for name, _ in get_requirement_names(requirements))
+    lines = []
+    for module, requirement in sorted(DEFAULT_REQUIREMENTS.items()):
+        if modules is not None and module not in modules:
+            continue
+        if not listed & set(normalize(name) for name in distributions.get(module, [module])):
+            lines.append(requirement + '\n')
+    if lines and requirements and not requirements.endswith('\n'):
+        requirements += '\n'
+    return requirements + ''.join(lines)
+
+
+def get_import_code(nodes):
+    """
+    Source of all import statements within the given nodes, which can be parsed even if the dumps of the nodes cannot,
+    e.g., RedBaron dumps of compound statements nested in a generated method.
+    """
+    imports = []
+    for node in nodes:
+        if node.type in ['import', 'from_import']:
+            import_nodes = [node]
+        else:
+            import_nodes = list(node.find_all('import')) + list(node.find_all('from_import'))
+        imports.extend(textwrap.dedent(import_node.dumps()).strip() for import_node in import_nodes)
+    return '\n'.join(imports)
+
+
+class RequirementsPruner:
+    """
+    Selects the lines of the requirements file of a script which are needed by a part, i.e., the requirements of the
+    distributions providing the modules imported by the part. The bundled mapping from modules to distributions can
+    be extended by the 'distributions' of the knowledge base, e.g., {"my_module": ["my-distribution"]}, which are added
+    to the bundled distributions of the module, e.g., optional dependencies like {"qiskit": ["matplotlib"]}.
+    """
+
+    def __init__(self, requirements, distributions=None):
+        self.requirements = requirements
+        self.distributions = dict(DISTRIBUTIONS)
+        for module, names in (distributions or {}).items():
+            names = [names] if isinstance(names, str) else names
+            self.distributions[module] = self.distributions.get(module, [module]) + list(names)
+
+        # Normalized distribution names of the lines, lines which do not refer to a distribution, e.g., options like
+        # '--index-url', are kept for every part
+        self.lines = get_requirement_names(requirements)
+
+    def prune(self, code, modules=frozenset()):
+        """
+        Requirements file with the requirements of the modules imported by the given code of a part and of the given
+        modules, e.g., modules needed to unpickle the parameters of the part.
+        """
+        imported_modules = get_imported_modules(code)
+        if imported_modules is None:
+            # Fall back to the complete requirements file, e.g., if the code contains syntax of a newer Python version
+            app.logger.warning('Could not determine the imports of the part... Use all requirements')
+            return add_default_requirements(self.requirements, distributions=self.distributions)
+
+        needed = set()
+        for module in (imported_modules | modules) - STDLIB_MODULES:
+            needed.update(normalize(name) for name in self.distributions.get(module, [module]))
+        lines = [line for name, line in self.lines if name is None or name in needed]
+        app.logger.debug('Requirements of the part: %s', lines)
+        return add_default_requirements(''.join(line + '\n' for line in lines), imported_modules | modules,
+                                        self.distributions)
@@ -18,8 +18,15 @@
 # ******************************************************************************
 #
 
+import logging
+
 from app import app
 from app.script_splitting.Labels import Labels
+from app.script_splitting.cost_model import LineCostModel, get_cost_model
+from app.script_splitting.knowledge_base import get_knowledge_base_matcher
+from app.script_splitting.liveness import get_assigned_names, get_loop_carried_names, get_read_names, get_test_names
+from app.script_splitting.splitting_context import SplittingContext
+from app.script_splitting.symbol_table import ImportSymbolTable
 
 
 class ScriptAnalyzer:
@@ -27,38 +34,28 @@ class ScriptAnalyzer:
     ROOT_SCRIPT = None
     WHITE_LIST = None
     BLACK_LIST = None
-    QUANTUM_OBJECTS = []
+    SYMBOL_TABLE = None
+    KNOWLEDGE_BASE = None
+    COST_MODEL = None
 
-    def __init__(self, script, white_list, black_list):
+    def __init__(self, script, white_list, black_list, context=None):
+        self.context = context if context is not None else SplittingContext()
         self.ROOT_SCRIPT = script
         self.WHITE_LIST = white_list
         self.BLACK_LIST = black_list
+        self.SYMBOL_TABLE = ImportSymbolTable(script)
+        self.KNOWLEDGE_BASE = get_knowledge_base_matcher(white_list, black_list)
+        self.COST_MODEL = get_cost_model(script, self.SYMBOL_TABLE)
 
-    def get_labels(self):
-        # Get Initial labels
-        labels = self.get_initial_labels(self.ROOT_SCRIPT)
-        app.logger.debug("Initial Labels:")
-
-        for key, value in labels.items():
-            app.logger.debug("LABEL: %s - %s" % (value, repr(key.dumps())))
-
-        # If code blocks (ifs, whiles, etc.) are not hybrid, their explicit label is changed to QUANTUM/CLASSICAL
-        dirty = True
-        max_iterations = 0
-        while dirty and max_iterations < 10:
-            relabel_code_blocks_if_not_hybrid(self.ROOT_SCRIPT, labels)
-            print("\nLabels after relabeling: %s" % labels)
-            for key, value in labels.items():
-                print("LABEL: %s - %s" % (value, repr(key.dumps())))
+    def get_labels(self, initial_labels=None):
+        # Get Initial labels (unless they are already known, e.g., reused from a previous job)
+        labels = initial_labels if initial_labels is not None else self.get_initial_labels(self.ROOT_SCRIPT)
+        log_labels("Initial Labels:", labels)
 
-            # Apply threshold to labels
-            dirty = apply_threshold(self.ROOT_SCRIPT, labels)
-            print("\nLabels after applying threshold: %s" % labels)
-
-            for key, value in labels.items():
-                print("LABEL: %s - %s" % (value, repr(key.dumps())))
-
-            max_iterations += 1
+        # If code blocks (ifs, whiles, etc.) are not hybrid, their explicit label is changed to QUANTUM/CLASSICAL and
+        # classical code between quantum code is relabeled if its estimated cost is smaller than the threshold
+        propagate_labels(self.ROOT_SCRIPT, labels, self.COST_MODEL, self.context.threshold)
+        log_labels("Labels after relabeling and applying threshold:", labels)
 
         return labels
 
@@ -66,7 +63,7 @@ class ScriptAnalyzer:
         labels = {}
 
         for baron_node in script:
-            app.logger.debug('Label code line: %s...' % repr(baron_node.dumps()))
+            app.logger.debug('Label code line: %s...', baron_node)
 
             # Handle imports
             if baron_node.type in ['import', 'from_import']:
@@ -120,7 +117,7 @@ class ScriptAnalyzer:
                 if label == Labels.QUANTUM:
                     app.logger.debug(
                         '"%s" is QUANTUM, thus, "%s" is QUANTUM as well.' % (baron_node.value, baron_node.target.value))
-                    self.QUANTUM_OBJECTS.append(baron_node.target.value)
+                    self.context.quantum_objects.append(baron_node.target.value)
 
             # Handle atomtrailers
             elif baron_node.type == 'atomtrailers':
@@ -135,102 +132,81 @@ class ScriptAnalyzer:
 
     def handle_atomic_trailer_nodes(self, atom_trailers_node):
         # Retrieve identifier on the left to check if it is quantum-specific
-        try:
-            left_most_identifier = atom_trailers_node.value[0]
-        except IndexError:
+        left_most_identifier = get_left_most_identifier(atom_trailers_node)
+        if left_most_identifier is None:
             return Labels.CLASSICAL
         app.logger.debug('Object on the left side of the atomtrailer node: %s' % left_most_identifier)
 
         # Check if identifier is contained in the list with assigned quantum objects
-        app.logger.debug('Check if %s is contained in %s: %s' % (
-            str(atom_trailers_node.value[0]), self.QUANTUM_OBJECTS, str(atom_trailers_node.value[0]) in self.QUANTUM_OBJECTS))
-        if str(atom_trailers_node.value[0]) in self.QUANTUM_OBJECTS:
+        app.logger.debug('Check if %s is contained in %s: %s',
+                         str(left_most_identifier), self.context.quantum_objects, str(left_most_identifier) in self.context.quantum_objects)
+        if str(left_most_identifier) in self.context.quantum_objects:
             app.logger.debug('Object already assigned as QUANTUM object!')
             return Labels.QUANTUM
         else:
             app.logger.debug('Object is NOT yet assigned as quantum!')
 
         # Check if the atomtrailer uses an import that is part of a quantum library defined in the knowledge base
-        if self.uses_quantum_import(atom_trailers_node.value[0]):
+        if self.uses_quantum_import(left_most_identifier, get_attribute_names(atom_trailers_node)):
             return Labels.QUANTUM
         else:
             return Labels.CLASSICAL
 
-    def uses_quantum_import(self, line_value):
-        import_statement = get_import_statement(line_value, self.ROOT_SCRIPT)
+    def uses_quantum_import(self, line_value, attribute_names=None):
+        import_statement = self.SYMBOL_TABLE.resolve(line_value)
         app.logger.info('Related module for line "%s" is: "%s"' % (line_value, import_statement))
-
-        # Check white and black list of knowledge bases separately
-        found_in_whitelist = is_in_knowledge_base(import_statement, self.WHITE_LIST)
-        found_in_blacklist = is_in_knowledge_base(import_statement, self.BLACK_LIST)
-        if found_in_whitelist:
-            if found_in_blacklist:
-                app.logger.info('Found module in whitelist but in blacklist, too. --> Classical!')
-            else:
-                app.logger.info('Found module in whitelist but not in blacklist. --> Quantum!')
+        if not import_statement:
+            app.logger.debug("Identifier is not imported from any module --> Classical!")
+            return False
+
+        # Symbol-level rules may refer to attributes of the imported module, e.g., qs.execute --> qiskit.execute
+        if attribute_names:
+            import_statement = import_statement + attribute_names
+
+        # Most specific rule of white and black list decides
+        found_quantum = self.KNOWLEDGE_BASE.is_quantum(import_statement)
+        if found_quantum:
+            app.logger.info('Most specific knowledge base rule for %s is on the whitelist. --> Quantum!' % import_statement)
         else:
-            app.logger.info('Did not find module in whitelist. --> Classical!')
-
-        # Element must be in white list but not in blacklist
-        return found_in_whitelist and not found_in_blacklist
-
-
-def get_import_statement(line_value, script):
-    app.logger.info('Get module for %s...' % line_value)
-
-    # Search through all 'from' imports and return matching modules
-    # E.g.: from qiskit.visualization import plot_histogram --> return qiskit.visualization.plot_histogram
-    as_imports = script.find_all('import')
-    for as_import in as_imports:
-        for dottedAsNameNode in as_import.value:
-            if hasattr(line_value, 'value') and dottedAsNameNode.target == line_value.value:
-                return [value.value for value in dottedAsNameNode.value if value.type == 'name']
-
-    # Search through all 'as' imports and return matching modules
-    # E.g.: import qiskit as qs --> return qiskit
-    from_imports = script.find_all('from_import')
-    for from_import in from_imports:
-        for target in from_import.targets:
-            if str(target.value) == str(line_value):
-                import_parts = [value.value for value in from_import.value if value.type == 'name']
-                import_parts.append(target.value)
-                return import_parts
-
-    # Return empty list since statement is not from any imported module
-    return []
-
-
-def is_in_knowledge_base(package_orig, knowledge_base):
-    # if any parameter is not defined, log warning and return False
-    if package_orig is None or knowledge_base is None:
-        app.logger.warning("Search for %s in %s is invalid since one of both is None." % (package_orig, knowledge_base))
-        return False
-
-    # If search term is empty, return False
-    if not package_orig:
-        app.logger.debug("Search for empty list in knowledge base --> return False")
-        return False
-
-    # Copy array to work on a copy instead of the original
-    package_copy = package_orig[:]
-
-    # Search in KB iteratively adding elements from package_orig to search term.
-    # E.g.: packages_copy =  ['first','second','third']
-    # Start to search for 'first' in KB. Continue with 'first.second', and finally search for 'first.second.third' in KB
-    search_list = []
-    while len(package_copy) > 0:
-        search_list.append(package_copy.pop(0))
-        if ".".join(search_list) in knowledge_base:
-            return True
+            app.logger.info('No whitelist rule or a more specific blacklist rule for %s. --> Classical!' % import_statement)
+        return found_quantum
 
-    return False
 
+def get_left_most_identifier(atom_trailers_node):
+    try:
+        return atom_trailers_node.value[0]
+    except IndexError:
+        return None
+
+
+def get_attribute_names(atom_trailers_node):
+    """Names of the attributes accessed on the left-most identifier before the first call or subscription."""
+    attribute_names = []
+    if atom_trailers_node.type != 'atomtrailers':
+        return attribute_names
+    for i, trailer in enumerate(atom_trailers_node.value):
+        if i == 0 or trailer.type == 'dot':
+            continue
+        if trailer.type != 'name':
+            break
+        attribute_names.append(trailer.value)
+    return attribute_names
+
+
+def log_labels(message, splitting_labels):
+    # Dumping all nodes is expensive for large scripts, thus, only do it if it is logged
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug(message)
+        for key, value in splitting_labels.items():
+            app.logger.debug("LABEL: %s - %s" % (value, repr(key.dumps())))
 
-def relabel_code_blocks_if_not_hybrid(script, splitting_labels):
-    found_quantum = False
-    found_classical = False
-    found_hybrid = False
 
+def propagate_labels(script, splitting_labels, cost_model=None, threshold=None):
+    """
+    Relabel code blocks which are not hybrid and apply the threshold to the given script.
+    The labels of a code block and the threshold only depend on the labels of the nested nodes, thus, handling nested
+    code blocks before the code block itself results in the final labels after a single pass.
+    """
     for node in script:
         if node not in splitting_labels:
             continue
@@ -239,8 +215,8 @@ def relabel_code_blocks_if_not_hybrid(script, splitting_labels):
         if splitting_labels[node] == Labels.IF_ELSE_BLOCK:
             labels = []
             for block in node.value:
-                label = relabel_code_blocks_if_not_hybrid(block, splitting_labels)
-                labels.append(label)
+                propagate_labels(block.value, splitting_labels, cost_model, threshold)
+                labels.append(get_block_label(block.value, splitting_labels))
             if "hybrid" not in labels:
                 if Labels.QUANTUM not in labels:
                     splitting_labels[node] = Labels.CLASSICAL
@@ -249,44 +225,77 @@ def relabel_code_blocks_if_not_hybrid(script, splitting_labels):
 
         # Handle loops recursively
         elif splitting_labels[node] == Labels.LOOP:
-            label = relabel_code_blocks_if_not_hybrid(node.value, splitting_labels)
+            propagate_labels(node.value, splitting_labels, cost_model, threshold)
+            label = get_block_label(node.value, splitting_labels)
             if label == Labels.QUANTUM:
                 splitting_labels[node] = Labels.QUANTUM
             elif label == Labels.CLASSICAL:
                 splitting_labels[node] = Labels.CLASSICAL
+            # Execute all iterations of hybrid for-loops in one part instead of one workflow iteration each if the
+            # quantum code of an iteration does not depend on previous iterations and no splitting marker is overridden
+            elif node.type == 'for' and app.config['LOOP_BATCHING'] == 'on' \
+                    and not contains_splitting_marker(node, splitting_labels) \
+                    and has_independent_iterations(node, splitting_labels):
+                app.logger.info('Batch all iterations of loop into one part: %s' % node.dumps().splitlines()[0])
+                splitting_labels[node] = Labels.QUANTUM
 
-        # If any one node in the list is Quantum/Classical, set found_quantum/found_classical to true
-        if splitting_labels[node] == Labels.QUANTUM:
-            found_quantum = True
-        elif splitting_labels[node] == Labels.CLASSICAL:
-            found_classical = True
-        elif splitting_labels[node] in [Labels.IF_ELSE_BLOCK, Labels.LOOP]:
-            found_hybrid = True
+    apply_threshold(script, splitting_labels, cost_model, threshold)
+
+
+def has_independent_iterations(node, splitting_labels):
+    """Whether no quantum statement of the loop reads values which are computed from previous iterations."""
+    return not depends_on_names(node.value, splitting_labels, set(get_loop_carried_names(node)))
+
+
+def contains_splitting_marker(node, splitting_labels):
+    return any(contains_label([node], splitting_labels, label)
+               for label in [Labels.FORCE_SPLIT, Labels.START_PREVENT_SPLIT, Labels.END_PREVENT_SPLIT])
+
+
+def depends_on_names(nodes, splitting_labels, names):
+    """
+    Whether a quantum statement of the nodes reads any of the given names or values computed from them. The names
+    assigned from them are added to the given names.
+    """
+    for node in nodes:
+        label = splitting_labels.get(node)
+        if node.type in ['ifelseblock', 'while', 'for'] and label != Labels.QUANTUM:
+            blocks = node.value if node.type == 'ifelseblock' else [node]
+            # Statements executed depending on the names depend on the names, too
+            if any((get_test_names(block) or frozenset()) & names for block in blocks):
+                if contains_label(blocks, splitting_labels, Labels.QUANTUM):
+                    return True
+                names.update(get_assigned_names([node]))
+                continue
+            for block in blocks:
+                if depends_on_names(block.value, splitting_labels, names):
+                    return True
+        elif get_read_names(node) & names:
+            if label == Labels.QUANTUM:
+                return True
+            names.update(get_assigned_names([node]))
+    return False
 
-    if found_hybrid:
-        return "hybrid"
-    if found_quantum and not found_classical:
-        return Labels.QUANTUM
-    if found_classical and not found_quantum:
-        return Labels.CLASSICAL
-    return "hybrid"
 
+def contains_label(blocks, splitting_labels, label):
+    for block in blocks:
+        for node in block.value:
+            if splitting_labels.get(node) == label:
+                return True
+            if node.type in ['ifelseblock', 'while', 'for'] and \
+                    contains_label(node.value if node.type == 'ifelseblock' else [node], splitting_labels, label):
+                return True
+    return False
 
 
-def relabel_code_blocks_if_not_hybrid_old(script, splitting_labels, parent=None):
+def get_block_label(script, splitting_labels):
     found_quantum = False
     found_classical = False
     found_hybrid = False
+
     for node in script:
         if node not in splitting_labels:
             continue
-        # Handle ifs recursively
-        if splitting_labels[node] == Labels.IF_ELSE_BLOCK:
-            for block in node.value:
-                relabel_code_blocks_if_not_hybrid(block, splitting_labels, node)
-        # Handle loops recursively
-        elif splitting_labels[node] == Labels.LOOP:
-            relabel_code_blocks_if_not_hybrid(node.value, splitting_labels, node)
 
         # If any one node in the list is Quantum/Classical, set found_quantum/found_classical to true
         if splitting_labels[node] == Labels.QUANTUM:
@@ -296,70 +305,57 @@ def relabel_code_blocks_if_not_hybrid_old(script, splitting_labels, parent=None)
         elif splitting_labels[node] in [Labels.IF_ELSE_BLOCK, Labels.LOOP]:
             found_hybrid = True
 
-    if found_hybrid or (found_quantum and found_classical):
-        return
-
-    # False for the first iteration where parent is root
-    if parent is not None and parent in splitting_labels:
-        # Relabel if only quantum labels were found
-        if found_quantum and not found_classical:
-            app.logger.debug('Relabel %s from %s to QUANTUM since it only contains quantum nodes' % (repr(parent.dumps()), splitting_labels[parent]))
-            splitting_labels[parent] = Labels.QUANTUM
-        # Relabel if only classical labels were found
-        elif found_classical and not found_quantum:
-            app.logger.debug('Relabel %s from %s to CLASSICAL since it only contains classical nodes' % (repr(parent.dumps()), splitting_labels[parent]))
-            splitting_labels[parent] = Labels.CLASSICAL
+    if found_hybrid:
+        return "hybrid"
+    if found_quantum and not found_classical:
+        return Labels.QUANTUM
+    if found_classical and not found_quantum:
+        return Labels.CLASSICAL
+    return "hybrid"
 
 
-def apply_threshold(script, splitting_labels):
-    app.logger.debug("Start relabeling with threshold=%s..." % app.config["SPLITTING_THRESHOLD"])
+def apply_threshold(script, splitting_labels, cost_model=None, threshold=None):
+    threshold = threshold if threshold is not None else app.config["SPLITTING_THRESHOLD"]
+    app.logger.debug("Start relabeling with threshold=%s..." % threshold)
     result = False
 
-    # Calculate number of classical lines before each quantum block and relabel if it is smaller than threshold
+    cost_model = cost_model if cost_model is not None else LineCostModel()
+
+    # Estimate cost of classical lines before each quantum block and relabel if it is smaller than threshold.
+    # Nested code blocks are already handled by propagate_labels.
     classical_nodes = []
     any_quantum = False
     for node in script:
         if node not in splitting_labels:
             continue
 
-        # Handle if-else-blocks recursively. Do not relabel preceding classical.
-        if splitting_labels[node] == Labels.IF_ELSE_BLOCK:
-            for block in node.value:
-                result = result or apply_threshold(block.value, splitting_labels)
-            classical_nodes = []
-
-        # Handle while-/for-blocks recursively. Do not relabel preceding classical.
-        if splitting_labels[node] == Labels.LOOP:
-            result = result or apply_threshold(node.value, splitting_labels)
+        # Do not relabel classical nodes preceding hybrid if-else-blocks and while-/for-blocks
+        if splitting_labels[node] in [Labels.IF_ELSE_BLOCK, Labels.LOOP]:
             classical_nodes = []
 
         # If a quantum label if found, relabel preceding classical nodes (when threshold is missed)
-        if splitting_labels[node] == Labels.QUANTUM:
-            result = result or relabel_if_threshold_not_reached(classical_nodes, splitting_labels)
+        elif splitting_labels[node] == Labels.QUANTUM:
+            result = relabel_if_threshold_not_reached(classical_nodes, splitting_labels, cost_model,
+                                                      threshold) or result
             classical_nodes = []
             any_quantum = True
 
         # Add classical labels to list of 'preceding' classical_nodes
-        if splitting_labels[node] == Labels.CLASSICAL:
+        elif splitting_labels[node] == Labels.CLASSICAL:
             classical_nodes.append(node)
 
-    # Calculate number of trailing classical lines and relabel if it is smaller than threshold.
+    # Estimate cost of trailing classical lines and relabel if it is smaller than threshold.
     # For code blocks only containing classical elements, any_quantum is False.
     if any_quantum:
-        result = result or relabel_if_threshold_not_reached(classical_nodes, splitting_labels)
+        result = relabel_if_threshold_not_reached(classical_nodes, splitting_labels, cost_model, threshold) or result
 
     return result
 
 
-def relabel_if_threshold_not_reached(classical_nodes, splitting_labels):
+def relabel_if_threshold_not_reached(classical_nodes, splitting_labels, cost_model, threshold):
     result = False
-    # Code blocks (ifs, whiles, etc.) also have additional code lines counted for threshold
-    weight = 0
-    for node in classical_nodes:
-        weight += calc_weight(node)
-
     # Relabel classical nodes if threshold is not reached
-    if 0 < weight < app.config["SPLITTING_THRESHOLD"]:
+    if cost_model.is_below_threshold(classical_nodes, threshold):
         for node in classical_nodes:
             if node in splitting_labels and splitting_labels[node] != Labels.QUANTUM:
                 relabel(node, splitting_labels)
@@ -380,17 +376,3 @@ def relabel(node, splitting_labels):
         for block in node.value:
             if block in splitting_labels:
                 relabel(block, splitting_labels)
-
-
-def calc_weight(node):
-    weight = 1
-    if node.type == 'ifelseblock':
-        for block in node.value:
-            weight -= 1
-            for x in block.value:
-                weight += calc_weight(x)
-    if node.type in ['while', 'for']:
-        weight -= 1
-        for block in node.value:
-            weight += calc_weight(block)
-    return weight
@@ -23,16 +23,24 @@ import os
 import zipfile
 import urllib.request
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
-from app import app
+from app import app, tracing
 from redbaron import RedBaron
 from app.script_splitting.flattener import flatten
 from app.script_splitting.script_analyzer import ScriptAnalyzer
 from app.script_splitting.script_splitter import ScriptSplitter
+from app.script_splitting.script_ir import parse_script
+from app.script_splitting.splitting_context import SplittingContext
+from app.script_splitting.template_engine import DOCKERFILE
+from app.script_splitting.artifact_store import artifact_hash, get_artifact_store, write_deterministic_zip
+from app.script_splitting.analysis_cache import get_analysis_cache, cache_key, serialize_analysis, deserialize_analysis
+from app.script_splitting import incremental_split, sharded_analysis
 from rq import get_current_job
 
 
-def do_the_split(qc_script_baron, requirements_file, knowledge_base_json):
+def do_the_split(qc_script_baron, requirements_file, knowledge_base_json, script=None, job_id=None,
+                 previous_job_id=None, threshold=None):
     white_list = knowledge_base_json['white_list']
     black_list = knowledge_base_json['black_list']
     app.logger.debug('Number of white list rules: %s' % len(white_list))
@@ -40,39 +48,114 @@ def do_the_split(qc_script_baron, requirements_file, knowledge_base_json):
 
     # Flatten the Script
     app.logger.info('Flatten Script')
-    flattened_file = flatten(qc_script_baron)
+    with tracing.span('flatten'):
+        flattened_file = flatten(qc_script_baron)
 
-    # Analyze the flattened script
-    app.logger.info('Start analyzing script...')
-    script_analyzer = ScriptAnalyzer(flattened_file, white_list, black_list)
-    map_labels = script_analyzer.get_labels()
+    # Load the analysis of the previous job to only compute the initial labels of changed statements, relabeling and
+    # splitting always handle the whole script
+    previous_snapshot = None
+    if previous_job_id is not None:
+        app.logger.info('Reuse initial labels of job %s' % previous_job_id)
+        previous_snapshot = incremental_split.load_snapshot(previous_job_id)
+
+    # State of analyzing and splitting this script
+    splitting_context = SplittingContext(threshold)
+
+    # Look up the analysis of an identical script in the cache
+    cache = get_analysis_cache()
+    cached_analysis = None
+    if cache is not None:
+        with tracing.span('analysis_cache'):
+            key = cache_key(script if script is not None else qc_script_baron.dumps(), knowledge_base_json,
+                            splitting_context.threshold)
+            entry = cache.get(key)
+            if entry is not None:
+                cached_analysis = deserialize_analysis(flattened_file, entry)
+        app.logger.debug('Analysis cache statistics: %s' % cache.stats())
+
+    statements = []
+    context = None
+    if cached_analysis is not None:
+        app.logger.info('Found analysis in cache... Skip analyzing script')
+        map_labels, code_blocks = cached_analysis
+        script_splitter = ScriptSplitter(flattened_file, requirements_file, map_labels, code_blocks,
+                                         context=splitting_context,
+                                         distributions=knowledge_base_json.get('distributions'))
+    else:
+        # Analyze the flattened script
+        app.logger.info('Start analyzing script...')
+        with tracing.span('get_labels'):
+            script_analyzer = ScriptAnalyzer(flattened_file, white_list, black_list, splitting_context)
+            knowledge_base_stats = script_analyzer.KNOWLEDGE_BASE.stats()
+            if previous_snapshot is None and sharded_analysis.use_sharded_analysis(flattened_file):
+                # Label large scripts in parallel
+                initial_labels = sharded_analysis.get_initial_labels(script_analyzer, flattened_file)
+                if job_id is not None:
+                    context = incremental_split.context_hash(flattened_file, knowledge_base_json,
+                                                             splitting_context.threshold)
+                    statements = incremental_split.snapshot_entries(flattened_file, initial_labels)
+                map_labels = script_analyzer.get_labels(initial_labels)
+            elif job_id is not None or previous_snapshot is not None:
+                # Label statement-wise to allow later jobs to reuse the labels of unchanged statements
+                context = incremental_split.context_hash(flattened_file, knowledge_base_json,
+                                                         splitting_context.threshold)
+                initial_labels, statements = incremental_split.get_initial_labels(script_analyzer, flattened_file,
+                                                                                  context, previous_snapshot)
+                map_labels = script_analyzer.get_labels(initial_labels)
+            else:
+                map_labels = script_analyzer.get_labels()
+        app.logger.debug('Knowledge base statistics: %s' % script_analyzer.KNOWLEDGE_BASE.stats(knowledge_base_stats))
+
+        script_splitter = ScriptSplitter(flattened_file, requirements_file, map_labels, context=splitting_context,
+                                         distributions=knowledge_base_json.get('distributions'))
+        with tracing.span('identify_code_blocks'):
+            script_splitter.CODE_BLOCKS = script_splitter.identify_code_blocks(flattened_file)
+        if cache is not None:
+            cache.put(key, serialize_analysis(flattened_file, map_labels, script_splitter.CODE_BLOCKS))
 
     # Split the script
     app.logger.info('Start splitting script...')
-    script_splitter = ScriptSplitter(flattened_file, requirements_file, map_labels)
-    script_parts = script_splitter.split_script()
+    with tracing.span('split_script'):
+        script_parts = script_splitter.split_script()
+
+    # Keep names of parts which did not change since the previous job
+    parts = incremental_split.reuse_unchanged_parts(script_parts, previous_snapshot)
+    if job_id is not None:
+        incremental_split.save_snapshot(job_id, {'context': context, 'statements': statements, 'parts': parts,
+                                                 'directory': os.path.join(app.config["RESULT_FOLDER"], job_id)})
 
     return script_parts
 
 
-def split_qc_script(script_url, requirements_url, knowledge_base_url):
+def parse_qc_script(script):
+    # Build the lightweight ast-based IR or the full-fidelity RedBaron tree depending on the configured front-end
+    if app.config['ANALYSIS_FRONTEND'] == 'ast':
+        app.logger.debug('Parse script using the ast front-end')
+        return parse_script(script)
+    return RedBaron(script)
+
+
+def split_qc_script(script_url, requirements_url, knowledge_base_url, previous_job_id=None, threshold=None):
     app.logger.info("Script Handler: Start splitting...")
 
-    # RedBaron object containing all information about the script to split
-    with urllib.request.urlopen(script_url) as script_file:
-        qc_script = RedBaron(script_file.read().decode('utf-8'))
+    # RedBaron object (or IR) containing all information about the script to split
+    with tracing.span('download_script'), urllib.request.urlopen(script_url) as script_file:
+        script = script_file.read().decode('utf-8')
+    tracing.observe('script_size_bytes', len(script))
+    with tracing.span('parse'):
+        qc_script = parse_qc_script(script)
     if qc_script is None or len(qc_script) == 0:
         app.logger.error('Could not load base script... Abort')
         return
 
     # Load Requirements File
-    with urllib.request.urlopen(requirements_url) as req_file:
+    with tracing.span('download_requirements'), urllib.request.urlopen(requirements_url) as req_file:
         requirements_file = req_file.read().decode('utf-8')
         app.logger.info('Loaded requirements')
 
     # Download knowledge base
     app.logger.info('Downloading knowledge base from: %s' % knowledge_base_url)
-    with urllib.request.urlopen(knowledge_base_url) as knowledge_base_file:
+    with tracing.span('download_knowledge_base'), urllib.request.urlopen(knowledge_base_url) as knowledge_base_file:
         knowledge_base_json = json.load(knowledge_base_file)
 
     if knowledge_base_json is None:
@@ -80,24 +163,32 @@ def split_qc_script(script_url, requirements_url, knowledge_base_url):
         return
 
     # Split into several script parts
-    script_parts = do_the_split(qc_script, requirements_file, knowledge_base_json)
+    with tracing.span('do_the_split'):
+        script_parts = do_the_split(qc_script, requirements_file, knowledge_base_json, script,
+                                    get_current_job().get_id(), previous_job_id, threshold)
+    tracing.observe('parts', len(script_parts['extracted_parts']))
 
     # Save all script parts as files
-    path = save_as_files(script_parts)
-    zip_file = zipfile.ZipFile(path + '.zip', 'w', zipfile.ZIP_DEFLATED)
-    zip_directory(path, zip_file)
-    zip_file.close()
+    with tracing.span('save_as_files'):
+        path = save_as_files(script_parts)
+    with tracing.span('zip'):
+        zip_file = zipfile.ZipFile(path + '.zip', 'w', zipfile.ZIP_DEFLATED)
+        zip_directory(path, zip_file)
+        zip_file.close()
 
-    return open(path + '.zip', "rb").read()
+    with open(path + '.zip', "rb") as file:
+        program = file.read()
+    tracing.observe('output_size_bytes', len(program))
+    return program
 
 
-def save_as_files(script_parts):
+def save_as_files(script_parts, job_id=None):
     if __name__ == '__main__':
         job_id = "__main__"
         if os.path.exists(os.path.join(app.config["RESULT_FOLDER"], job_id)):
             app.logger.debug('Delete upload folder %s' % app.config['RESULT_FOLDER'])
             shutil.rmtree(app.config['RESULT_FOLDER'])
-    else:
+    elif job_id is None:
         job_id = get_current_job().get_id()
 
     # Create result directory if not existing
@@ -112,6 +203,11 @@ def save_as_files(script_parts):
         file.write(json.dumps(script_parts['workflow.json']))
         file.close()
 
+    # Write the critical path of the workflow with and without parallel gateways to disk
+    if script_parts.get('critical_path') is not None:
+        with open(os.path.join(directory, 'critical_path.json'), "w") as file:
+            file.write(json.dumps(script_parts['critical_path']))
+
     # Write iterators to disk
     iterators_directory = os.path.join(directory, 'iterators')
     if not os.path.exists(iterators_directory):
@@ -123,56 +219,100 @@ def save_as_files(script_parts):
             file.close()
 
     # Save extracted parts to separate subdirectories
+    artifact_store = get_artifact_store()
+    artifacts = {}
+    parts = []
     for part in script_parts['extracted_parts']:
-        # Create subdirectory
-        part_directory = os.path.join(directory, part['name'], "service")
-        if not os.path.exists(part_directory):
-            app.logger.debug("Create 'part' folder %s" % part_directory)
-            os.makedirs(part_directory)
-        # Write app.py to disk
-        with open(os.path.join(part_directory, "app.py"), "w") as file:
-            app.logger.debug("Create app.py in %s" % part_directory)
-            for x in part['app.py']:
-                app.logger.debug("Write %s to app.py" % x.dumps())
-                a = x.dumps()
-                b = a
-                file.write(b)
-                file.write("\n")
-            file.close()
-        # Remove unused imports using autoflake
-        args = lambda: None; args.ignore_init_module_imports = False; args.imports = ""; args.expand_star_imports = False; args.remove_all_unused_imports = True; args.remove_duplicate_keys = False; args.remove_unused_variables = False; args.check = False; args.in_place = True
-        autoflake.fix_file(os.path.join(part_directory, "app.py"), args=args, standard_out=sys.stdout)
-        # Write requirements.txt to disk
-        with open(os.path.join(part_directory, "requirements.txt"), "w") as file:
-            app.logger.debug("Write requirements.txt to %s" % part_directory)
-            file.write(part['requirements.txt'])
-            file.close()
-
-        # Add polling agent
-        with open(os.path.join(part_directory, "polling_agent.py"), "w") as file:
-            app.logger.debug("Write polling_agent.py to %s" % part_directory)
-            file.write(part['polling_agent.py'])
+        # Do not ship parts which were already built by a previous job
+        if artifact_store is not None:
+            key = artifact_hash(part)
+            cached = artifact_store.contains(key)
+            artifacts[part['name']] = {'hash': key, 'cached': cached}
+            if cached:
+                app.logger.debug("Part %s is already contained in the artifact store" % part['name'])
+                continue
+        parts.append(part)
 
-        # Zip contents so far
-        zip_path = os.path.join(directory, part['name'], "service.zip")
-        zip_file = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED)
-        zip_directory(part_directory, zip_file)
-        zip_file.close()
+    # Parts are written to separate directories, thus, they are emitted concurrently
+    with ThreadPoolExecutor(max_workers=app.config['SAVE_WORKERS']) as executor:
+        futures = [executor.submit(emit_part, directory, part, tracing.fork()) for part in parts]
+        try:
+            # Wait for the parts in their order, thus, the first failing part raises its error
+            for part, future in zip(parts, futures):
+                tracing.join(future.result())
+                if artifact_store is not None:
+                    artifact_store.put(artifacts[part['name']]['hash'], os.path.join(directory, part['name']))
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
 
-        # Copy Dockerfile
-        source_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates", "Dockerfile")
-        shutil.copyfile(source_path, os.path.join(directory, part['name'], "Dockerfile"))
+    # List the hashes of all parts and whether they are contained in the result or only in the artifact store
+    if artifact_store is not None:
+        with open(os.path.join(directory, 'artifacts.json'), "w") as file:
+            file.write(json.dumps(artifacts))
 
     return directory
 
 
+def emit_part(directory, part, trace):
+    """Save the part on a worker thread, its spans are recorded in the given forked trace of the job."""
+    with tracing.attach(trace), tracing.span('save_part', part=part['name']):
+        # Copy parts which are unchanged since a previous job
+        if part.get('reused_from') and os.path.exists(part['reused_from']):
+            app.logger.debug("Copy unchanged part from %s" % part['reused_from'])
+            shutil.copytree(part['reused_from'], os.path.join(directory, part['name']), dirs_exist_ok=True)
+        else:
+            save_part(directory, part)
+    return trace
+
+
+def save_part(directory, part):
+    """Write the files of the part, i.e., its service, zipped service, and Dockerfile, to its subdirectory."""
+    # Create subdirectory
+    part_directory = os.path.join(directory, part['name'], "service")
+    if not os.path.exists(part_directory):
+        app.logger.debug("Create 'part' folder %s" % part_directory)
+        os.makedirs(part_directory)
+    # Write app.py to disk
+    with open(os.path.join(part_directory, "app.py"), "w") as file:
+        app.logger.debug("Create app.py in %s" % part_directory)
+        for x in part['app.py']:
+            code = x.dumps()
+            app.logger.debug("Write %s to app.py", code)
+            file.write(code)
+            file.write("\n")
+        file.close()
+    # Unused imports of the script are not added to parts, optionally remove unused imports within the code, too
+    if app.config['AUTOFLAKE'] == 'on':
+        args = lambda: None; args.ignore_init_module_imports = False; args.imports = ""; args.expand_star_imports = False; args.remove_all_unused_imports = True; args.remove_duplicate_keys = False; args.remove_unused_variables = False; args.check = False; args.in_place = True
+        with tracing.span('autoflake'):
+            autoflake.fix_file(os.path.join(part_directory, "app.py"), args=args, standard_out=sys.stdout)
+    # Write requirements.txt to disk
+    with open(os.path.join(part_directory, "requirements.txt"), "w") as file:
+        app.logger.debug("Write requirements.txt to %s" % part_directory)
+        file.write(part['requirements.txt'])
+        file.close()
+
+    # Add polling agent
+    with open(os.path.join(part_directory, "polling_agent.py"), "w") as file:
+        app.logger.debug("Write polling_agent.py to %s" % part_directory)
+        file.write(part['polling_agent.py'])
+
+    # Zip contents so far
+    zip_path = os.path.join(directory, part['name'], "service.zip")
+    zip_file = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED)
+    zip_directory(part_directory, zip_file)
+    zip_file.close()
+
+    # Write Dockerfile
+    with open(os.path.join(directory, part['name'], "Dockerfile"), "w") as file:
+        file.write(DOCKERFILE.render())
+
+
 def zip_directory(directory_path, zip_file):
     app.logger.debug("Combine all files from directory %s to zip file %s" % (directory_path, zip_file.filename))
-    for root, dirs, files in os.walk(directory_path):
-        for file in files:
-            zip_file.write(os.path.join(root, file),
-                           os.path.relpath(os.path.join(root, file),
-                                           os.path.join(directory_path, '..')))
+    write_deterministic_zip(zip_file, directory_path, os.path.join(directory_path, '..'))
 
 
 if __name__ == '__main__':
@@ -182,7 +322,7 @@ if __name__ == '__main__':
     rq_path = os.path.join(basedir, "files", "requirements.txt")
     kb_path = os.path.join(basedir, "knowledge_base", "knowledge_base.json")
 
-    rb = RedBaron(open(script_path, "r").read())
+    rb = parse_qc_script(open(script_path, "r").read())
     result = do_the_split(rb, open(rq_path, "r").read(), json.load(open(kb_path, "r")))
     path = save_as_files(result)
     app.logger.info("Stored result to %s" % path)
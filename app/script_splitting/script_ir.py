@@ -0,0 +1,489 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+"""
+Compact intermediate representation (IR) of a script built from the standard
+library ``ast`` and ``tokenize`` modules.
+
+The IR only keeps node types, children and source spans. It exposes the small
+subset of the RedBaron node interface used by the ScriptAnalyzer and the
+ScriptSplitter (type, value, test, target, name, dumps, find_all and
+iteration), so that both can run unchanged on either representation. Source
+text is only sliced from the original script when it is actually needed.
+"""
+
+import ast
+import bisect
+import io
+import keyword
+import tokenize
+
+# Compound statements which are not analyzed further and are handled as a single node
+OPAQUE_STATEMENT_TYPES = ('def', 'class', 'try', 'with')
+
+# Indentation used for the body of generated methods
+METHOD_INDENTATION = "    "
+
+BINARY_OPERATORS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.MatMult: '@', ast.Div: '/', ast.Mod: '%',
+                    ast.Pow: '**', ast.LShift: '<<', ast.RShift: '>>', ast.BitOr: '|', ast.BitXor: '^',
+                    ast.BitAnd: '&', ast.FloorDiv: '//'}
+UNARY_OPERATORS = {ast.Invert: '~', ast.Not: 'not', ast.UAdd: '+', ast.USub: '-'}
+
+STATEMENT_TYPES = {ast.Delete: 'del', ast.Pass: 'pass', ast.Break: 'break', ast.Continue: 'continue',
+                   ast.Return: 'return', ast.Raise: 'raise', ast.Assert: 'assert', ast.Global: 'global',
+                   ast.Nonlocal: 'nonlocal', ast.FunctionDef: 'def', ast.AsyncFunctionDef: 'def',
+                   ast.ClassDef: 'class', ast.Try: 'try', ast.With: 'with', ast.AsyncWith: 'with',
+                   ast.AsyncFor: 'for', ast.AnnAssign: 'annassign'}
+
+
+class IRNode:
+    """
+    A statement or expression of the script. The meaning of 'value' follows RedBaron: children for code blocks,
+    the assigned expression for assignments, the text for comments and the trailers for atomtrailers.
+    """
+
+    __slots__ = ('root', 'type', 'value', 'start', 'end', 'test', 'target', '_name', '_names')
+
+    def __init__(self, root, node_type, value, start, end):
+        self.root = root
+        self.type = node_type
+        self.value = value
+        self.start = start
+        self.end = end
+        self.test = None
+        self.target = None
+        self._name = None
+        self._names = None
+
+    def __iter__(self):
+        # Only nodes with a list of children are iterable (same as RedBaron)
+        if isinstance(self.value, list):
+            return iter(self.value)
+        raise TypeError("'%s' node is not iterable" % self.type)
+
+    def __len__(self):
+        if isinstance(self.value, list):
+            return len(self.value)
+        return 1
+
+    def __getitem__(self, index):
+        if isinstance(self.value, list):
+            return self.value[index]
+        raise TypeError("'%s' node does not support indexing" % self.type)
+
+    def __str__(self):
+        return self.dumps()
+
+    def __repr__(self):
+        return '<IRNode %s %s>' % (self.type, repr(self.dumps()))
+
+    @property
+    def targets(self):
+        return self.target
+
+    @property
+    def name(self):
+        """Name of a def/class node, otherwise the first name used in the node."""
+        if self._name is None:
+            names = self.root.names_between(self.start, self.end)
+            self._name = names[0] if names else ''
+        return self._name
+
+    def dumps(self):
+        return self.root.source[self.start:self.end]
+
+    def names(self):
+        """Set of all names used in the node."""
+        if self._names is None:
+            self._names = frozenset(self.root.names_between(self.start, self.end))
+        return self._names
+
+    def find_all(self, identifier, value=None, **kwargs):
+        if identifier in ('NameNode', 'name') and value is not None and not callable(value) and not kwargs:
+            return [self] if value in self.names() else []
+        return [node for node in walk(self) if matches(node, identifier, value, kwargs)]
+
+
+class ScriptIR:
+    """Root of the IR holding the original source and the top level nodes."""
+
+    type = 'root'
+
+    def __init__(self, source):
+        self.source = source
+        self.value = []
+        self._line_offsets = [0]
+        for line in source.splitlines(keepends=True):
+            self._line_offsets.append(self._line_offsets[-1] + len(line))
+        self._ascii = source.isascii()
+        self._name_offsets = []
+        self._name_values = []
+        self._comments = []
+        self._logical_line_starts = set()
+        self._keyword_offsets = {}
+        self.imports = []
+        self._tokenize()
+
+        tree = ast.parse(source)
+        self.value = [self._build_statement(statement) for statement in tree.body]
+        self.imports.sort(key=lambda node: node.start)
+        for comment in self._comments:
+            place_comment(self, self.value, comment)
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, index):
+        return self.value[index]
+
+    def dumps(self):
+        return self.source
+
+    def find_all(self, identifier, value=None, **kwargs):
+        if identifier in ('import', 'from_import') and value is None and not kwargs:
+            return [node for node in self.imports if node.type == identifier]
+        return [node for node in walk(self) if matches(node, identifier, value, kwargs)]
+
+    def offset(self, line, column):
+        """Character offset of the given line (1-based) and character column."""
+        return self._line_offsets[line - 1] + column
+
+    def line_of(self, offset):
+        return bisect.bisect_right(self._line_offsets, offset)
+
+    def names_between(self, start, end):
+        first = bisect.bisect_left(self._name_offsets, start)
+        last = bisect.bisect_left(self._name_offsets, end)
+        return self._name_values[first:last]
+
+    def keyword_between(self, word, start, end):
+        offsets = self._keyword_offsets.get(word, [])
+        index = bisect.bisect_left(offsets, start)
+        if index < len(offsets) and offsets[index] < end:
+            return offsets[index]
+        return None
+
+    def _tokenize(self):
+        depth = 0
+        line_start = True
+        skip_next_name = False
+        for token in tokenize.generate_tokens(io.StringIO(self.source).readline):
+            token_type, string, (line, column), (end_line, end_column), _ = token
+            if token_type in (tokenize.NEWLINE, tokenize.NL):
+                line_start = depth == 0
+                continue
+            if token_type in (tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER):
+                continue
+            if line_start:
+                self._logical_line_starts.add(line)
+                line_start = False
+            offset = self.offset(line, column)
+            if token_type == tokenize.COMMENT:
+                self._comments.append((offset, self.offset(end_line, end_column), string))
+            elif token_type == tokenize.OP:
+                if string in '([{':
+                    depth += 1
+                elif string in ')]}':
+                    depth -= 1
+            elif token_type == tokenize.NAME:
+                if keyword.iskeyword(string):
+                    self._keyword_offsets.setdefault(string, []).append(offset)
+                    # Names of defined functions and classes are no NameNodes in RedBaron
+                    skip_next_name = string in ('def', 'class')
+                    continue
+                if not skip_next_name:
+                    self._name_offsets.append(offset)
+                    self._name_values.append(string)
+                skip_next_name = False
+
+    def _position(self, line, byte_column):
+        if not self._ascii:
+            # ast reports columns as utf-8 byte offsets
+            line_text = self.source[self._line_offsets[line - 1]:self._line_offsets[line]]
+            byte_column = len(line_text.encode('utf-8')[:byte_column].decode('utf-8', errors='replace'))
+        return self.offset(line, byte_column)
+
+    def _span(self, node):
+        start = self._position(node.lineno, node.col_offset)
+        end = self._position(node.end_lineno, node.end_col_offset)
+        return start, end
+
+    def _build_statement(self, statement):
+        start, end = self._span(statement)
+
+        if isinstance(statement, ast.If):
+            return self._build_if_else_block(statement, start, end)
+
+        if isinstance(statement, (ast.For, ast.While)):
+            node = IRNode(self, 'for' if isinstance(statement, ast.For) else 'while', None, start, end)
+            if isinstance(statement, ast.For):
+                node.target = self._build_expression(statement.iter)
+            else:
+                node.test = self._build_expression(statement.test)
+            node.value = [self._build_statement(child) for child in statement.body]
+            return node
+
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and statement.decorator_list:
+            decorator = statement.decorator_list[0]
+            # the span of a decorated definition starts at the '@' in front of the first decorator
+            start = self._position(decorator.lineno, decorator.col_offset) - 1
+
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            node = self._build_import(statement, start, end)
+            self.imports.append(node)
+            return node
+
+        for child in ast.walk(statement):
+            if isinstance(child, (ast.Import, ast.ImportFrom)) and child is not statement:
+                child_start, child_end = self._span(child)
+                self.imports.append(self._build_import(child, child_start, child_end))
+
+        if isinstance(statement, (ast.Assign, ast.AugAssign)) or \
+                (isinstance(statement, ast.AnnAssign) and statement.value is not None):
+            node = IRNode(self, 'assignment', self._build_expression(statement.value), start, end)
+            target = statement.targets[0] if isinstance(statement, ast.Assign) else statement.target
+            node.target = self._build_expression(target)
+            return node
+
+        if isinstance(statement, ast.Expr):
+            expression = statement.value
+            if isinstance(expression, ast.Call) and isinstance(expression.func, ast.Name) \
+                    and expression.func.id == 'print':
+                return IRNode(self, 'print', None, start, end)
+            return self._build_expression(expression)
+
+        node = IRNode(self, STATEMENT_TYPES.get(type(statement), type(statement).__name__.lower()), None, start, end)
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            node._name = statement.name
+        return node
+
+    def _build_if_else_block(self, statement, start, end):
+        block = IRNode(self, 'ifelseblock', [], start, end)
+        branch_type = 'if'
+        branch_start = start
+        while True:
+            branch = IRNode(self, branch_type, [self._build_statement(child) for child in statement.body],
+                            branch_start, self._span(statement.body[-1])[1])
+            branch.test = self._build_expression(statement.test)
+            block.value.append(branch)
+            if not statement.orelse:
+                break
+            orelse_start = self._span(statement.orelse[0])[0]
+            if len(statement.orelse) == 1 and isinstance(statement.orelse[0], ast.If) \
+                    and self.source.startswith('elif', orelse_start):
+                statement = statement.orelse[0]
+                branch_type = 'elif'
+                branch_start = orelse_start
+                continue
+            else_start = self.keyword_between('else', branch.end, orelse_start)
+            block.value.append(IRNode(self, 'else', [self._build_statement(child) for child in statement.orelse],
+                                      else_start, self._span(statement.orelse[-1])[1]))
+            break
+        return block
+
+    def _build_import(self, statement, start, end):
+        if isinstance(statement, ast.Import):
+            node = IRNode(self, 'import', [], start, end)
+            for alias in statement.names:
+                dotted_as_name = IRNode(self, 'dotted_as_name', [], start, end)
+                dotted_as_name.value = [IRNode(self, 'name', part, start, end) for part in alias.name.split('.')]
+                dotted_as_name.target = alias.asname or ''
+                node.value.append(dotted_as_name)
+            return node
+
+        module = statement.module.split('.') if statement.module else []
+        node = IRNode(self, 'from_import', [IRNode(self, 'name', part, start, end) for part in module], start, end)
+        node.target = []
+        for alias in statement.names:
+            name_as_name = IRNode(self, 'name_as_name', alias.name, start, end)
+            name_as_name.target = alias.asname or ''
+            node.target.append(name_as_name)
+        return node
+
+    def _build_expression(self, expression):
+        """
+        Build the IR node for an expression. To keep labels identical to the RedBaron-based analysis, 'value' holds
+        what RedBaron stores there: the trailers of atomtrailers, the elements of collections, and the textual
+        value (name, literal or operator) of all other expressions.
+        """
+        start, end = self._span(expression)
+
+        if isinstance(expression, (ast.Call, ast.Attribute, ast.Subscript)):
+            trailers = []
+            while isinstance(expression, (ast.Call, ast.Attribute, ast.Subscript)):
+                inner_end = self._span(expression.func if isinstance(expression, ast.Call) else expression.value)[1]
+                if isinstance(expression, ast.Call):
+                    trailers.append(IRNode(self, 'call', [], inner_end, self._span(expression)[1]))
+                    expression = expression.func
+                elif isinstance(expression, ast.Subscript):
+                    trailers.append(IRNode(self, 'getitem', [], inner_end, self._span(expression)[1]))
+                    expression = expression.value
+                else:
+                    attribute_end = self._span(expression)[1]
+                    attribute_start = attribute_end - len(expression.attr)
+                    trailers.append(IRNode(self, 'name', expression.attr, attribute_start, attribute_end))
+                    trailers.append(IRNode(self, 'dot', '.', attribute_start, attribute_start))
+                    expression = expression.value
+            trailers.append(self._build_expression(expression))
+            trailers.reverse()
+            return IRNode(self, 'atomtrailers', trailers, start, end)
+
+        if isinstance(expression, ast.Name):
+            return IRNode(self, 'name', expression.id, start, end)
+
+        if isinstance(expression, ast.Constant):
+            if isinstance(expression.value, str):
+                node_type = 'string'
+            elif isinstance(expression.value, (bool, type(None))):
+                node_type = 'name'
+            else:
+                node_type = type(expression.value).__name__
+            return IRNode(self, node_type, self.source[start:end], start, end)
+
+        if isinstance(expression, (ast.Tuple, ast.List, ast.Set)):
+            return IRNode(self, type(expression).__name__.lower(),
+                          [self._build_expression(element) for element in expression.elts], start, end)
+
+        if isinstance(expression, ast.Dict):
+            items = []
+            for key, value in zip(expression.keys, expression.values):
+                item_start = self._span(key)[0] if key is not None else self._span(value)[0]
+                items.append(IRNode(self, 'dictitem', [], item_start, self._span(value)[1]))
+            return IRNode(self, 'dict', items, start, end)
+
+        if isinstance(expression, ast.BinOp):
+            return IRNode(self, 'binary_operator', BINARY_OPERATORS[type(expression.op)], start, end)
+
+        if isinstance(expression, ast.BoolOp):
+            return IRNode(self, 'boolean_operator', 'and' if isinstance(expression.op, ast.And) else 'or', start, end)
+
+        if isinstance(expression, ast.UnaryOp):
+            return IRNode(self, 'unitary_operator', UNARY_OPERATORS[type(expression.op)], start, end)
+
+        # RedBaron does not provide an indexable value for the remaining expressions, use an empty list instead
+        return IRNode(self, type(expression).__name__.lower(), [], start, end)
+
+    def indentation_of(self, offset):
+        line_start = self._line_offsets[self.line_of(offset) - 1]
+        indentation = self.source[line_start:offset]
+        return indentation if indentation.isspace() else ''
+
+    def reindent(self, node, indentation):
+        """Return the source of the node with its logical lines moved to the given indentation."""
+        base_indentation = self.indentation_of(node.start)
+        first_line = self.line_of(node.start)
+        lines = node.dumps().split('\n')
+        result = [indentation + lines[0]]
+        for line_number, line in enumerate(lines[1:], first_line + 1):
+            if not line.strip():
+                result.append('')
+            elif line_number in self._logical_line_starts and line.startswith(base_indentation):
+                result.append(indentation + line[len(base_indentation):])
+            else:
+                result.append(line)
+        return '\n'.join(result)
+
+
+class GeneratedCode:
+    """Source code generated from IR nodes, e.g., a method extracted from a code block."""
+
+    __slots__ = ('code',)
+
+    def __init__(self, code):
+        self.code = code
+
+    def __str__(self):
+        return self.code
+
+    def dumps(self):
+        return self.code
+
+
+def parse_script(source):
+    return ScriptIR(source)
+
+
+def is_ir(script):
+    return isinstance(script, (ScriptIR, IRNode))
+
+
+def place_comment(root, body, comment):
+    """Add a comment to the innermost code block it belongs to, as tokenize/RedBaron assign them."""
+    start, end, text = comment
+    index = bisect.bisect_right([node.start for node in body], start)
+    if index > 0:
+        node = body[index - 1]
+        # Comments following a code block belong to the innermost block until the next dedented statement
+        if node.type in ('for', 'while', 'ifelseblock'):
+            node.end = max(node.end, end)
+            if node.type == 'ifelseblock':
+                branch = [branch for branch in node.value if branch.start <= start][-1]
+                branch.end = max(branch.end, end)
+                place_comment(root, branch.value, comment)
+            else:
+                place_comment(root, node.value, comment)
+            return
+        # Statements which are not analyzed any further absorb their comments
+        if node.type in OPAQUE_STATEMENT_TYPES:
+            node.end = max(node.end, end)
+            return
+    body.insert(index, IRNode(root, 'comment', text, start, end))
+
+
+def walk(node):
+    """Iterate over all statement level nodes in rendering order (the root itself is excluded)."""
+    if isinstance(node.value, list):
+        children = node.value
+    else:
+        children = [node.value] if isinstance(node.value, IRNode) else []
+    for child in children:
+        yield child
+        yield from walk(child)
+
+
+def matches(node, identifier, value, attributes):
+    node_type = identifier[:-4].lower() if identifier.endswith('Node') else identifier
+    if node.type != node_type:
+        return False
+    for attribute, expected in [('value', value)] + list(attributes.items()):
+        if expected is None:
+            continue
+        actual = getattr(node, attribute)
+        if callable(expected):
+            if not expected(actual):
+                return False
+        elif actual != expected:
+            return False
+    return True
+
+
+def create_method(method_name, code_block, parameters, return_variables):
+    """Create the source of a method with the given code block as body, equivalent to the RedBaron def node."""
+    lines = ["def " + method_name + "(" + ", ".join(parameters) + "):"]
+    for node in code_block:
+        if node.type == 'comment':
+            lines.append(METHOD_INDENTATION + node.dumps())
+        else:
+            lines.append(node.root.reindent(node, METHOD_INDENTATION))
+    if len(return_variables) > 0:
+        lines.append(METHOD_INDENTATION + "return " + ", ".join(return_variables))
+    return GeneratedCode('\n'.join(lines) + '\n')
@@ -17,15 +17,30 @@
 #  limitations under the License.
 # ******************************************************************************
 
+import hashlib
 import random
 import string
-import os
 
 from redbaron import RedBaron, NodeList
 
 from app import app
 from app.script_splitting.Labels import Labels
+from app.script_splitting.cost_model import get_cost_model
+from app.script_splitting.import_pruning import ImportPruner
+from app.script_splitting.name_index import NameIndex, get_names
+from app.script_splitting.liveness import LivenessAnalysis, get_assigned_names
+from app.script_splitting.parallel_gateways import critical_path_report, parallelize
+from app.script_splitting.partitioning import partition
+from app.script_splitting.script_analyzer import log_labels
 from app.script_splitting.polling_agent_generator import generate_polling_agent
+from app.script_splitting.requirements_pruning import RequirementsPruner, add_default_requirements, \
+    get_import_code, get_imported_modules
+from app.script_splitting import script_ir
+from app.script_splitting.script_tasks import JsonVariables, get_modified_variables, get_script_task_code, \
+    script_task_name
+from app.script_splitting.splitting_context import CodeBlocks, SplittingContext
+from app.script_splitting.symbol_table import ImportSymbolTable
+from app.script_splitting.template_engine import ITERATOR_SCRIPT, reload_changed_templates
 
 
 class ScriptSplitter:
@@ -33,40 +48,83 @@ class ScriptSplitter:
     ROOT_SCRIPT = None
     REQUIREMENTS = None
     SPLITTING_LABELS = None
-    integrated_blocks = []
-    all_possible_return_variables = []
-    iterators = []
-    all_imports = []
-
-    def __init__(self, script, requirements, splitting_labels):
+    CODE_BLOCKS = None
+    NAME_INDEX = None
+    LIVENESS = None
+    RETURN_VARIABLES = None
+    COST_MODEL = None
+    IMPORT_PRUNER = None
+    DISTRIBUTIONS = None
+    REQUIREMENTS_PRUNER = None
+    JSON_VARIABLES = None
+    VARIABLE_MODULES = None
+
+    def __init__(self, script, requirements, splitting_labels, code_blocks=None, context=None, distributions=None):
+        self.context = context if context is not None else SplittingContext()
         self.ROOT_SCRIPT = script
         self.REQUIREMENTS = requirements
+        self.DISTRIBUTIONS = distributions
         self.SPLITTING_LABELS = splitting_labels
+        self.CODE_BLOCKS = code_blocks
 
     def split_script(self):
-        print("Start splitting script with following labels:")
-        for key, value in self.SPLITTING_LABELS.items():
-            print("LABEL: %s - %s" % (value, repr(key.dumps())))
+        log_labels("Start splitting script with following labels:", self.SPLITTING_LABELS)
+
+        # Pick up templates which were modified since the previous job
+        reload_changed_templates()
+
+        # Code blocks may already be known, e.g., from the analysis cache
+        if self.CODE_BLOCKS is None:
+            self.CODE_BLOCKS = self.identify_code_blocks(self.ROOT_SCRIPT)
+        elif not isinstance(self.CODE_BLOCKS, CodeBlocks):
+            self.CODE_BLOCKS = CodeBlocks(self.CODE_BLOCKS)
+        code_blocks = self.CODE_BLOCKS
+
+        # Hand over only variables which are live between parts
+        if app.config['HANDOFF_ANALYSIS'] == 'liveness':
+            self.LIVENESS = LivenessAnalysis(self.ROOT_SCRIPT, self.SPLITTING_LABELS, code_blocks)
+            # Return variables of all parts must be known upfront, as parts in loops may read variables of later parts
+            self.RETURN_VARIABLES = {}
+            for i in self.LIVENESS.order:
+                return_variables = self.compute_return_variables(code_blocks[i])
+                self.RETURN_VARIABLES[id(code_blocks[i])] = return_variables
+                self.context.all_possible_return_variables.extend(return_variables)
+            self.LIVENESS.compute_defined({i: frozenset(self.RETURN_VARIABLES[id(code_blocks[i])])
+                                           for i in self.LIVENESS.order})
 
-        code_blocks = self.identify_code_blocks(self.ROOT_SCRIPT)
         for line in self.ROOT_SCRIPT:
             if self.SPLITTING_LABELS[line] == Labels.IMPORTS:
-                self.all_imports.append(line)
+                self.context.all_imports.append(line)
+        self.IMPORT_PRUNER = ImportPruner(self.context.all_imports)
+        if app.config['PART_REQUIREMENTS'] == 'minimal':
+            self.REQUIREMENTS_PRUNER = RequirementsPruner(self.REQUIREMENTS, self.DISTRIBUTIONS)
+            self.VARIABLE_MODULES = self.compute_variable_modules(code_blocks)
+        if app.config['SCRIPT_TASKS'] == 'on':
+            self.JSON_VARIABLES = JsonVariables(self.ROOT_SCRIPT)
 
         result_workflow = [{"type": "start", "variables": []}]
         script_parts = self.build_base_script(self.ROOT_SCRIPT, code_blocks, result_workflow)
         result_workflow.append({"type": "end"})
 
+        # Let the workflow engine execute consecutive parts which do not exchange any variables concurrently
+        critical_path = None
+        if app.config['PARALLEL_GATEWAYS'] == 'on':
+            sequential_workflow = result_workflow
+            result_workflow = parallelize(sequential_workflow, self.context.step_interfaces)
+            critical_path = critical_path_report(sequential_workflow, result_workflow)
+
         for x in result_workflow:
             app.logger.debug(x)
 
-        return {'extracted_parts': script_parts, 'workflow.json': result_workflow, 'iterators': self.iterators}
+        return {'extracted_parts': script_parts, 'workflow.json': result_workflow, 'iterators': self.context.iterators,
+                'critical_path': critical_path}
 
     def build_base_script(self, nodes, code_blocks, result_workflow):
         script_parts = []
         for node in nodes:
             # if node is not in any code block
-            if which_code_block(node, code_blocks) == -1:
+            block_id = code_blocks.get_block_id(node)
+            if block_id == -1:
                 if node in self.SPLITTING_LABELS and self.SPLITTING_LABELS[node] == Labels.LOOP:
                     if node.type == "while":
                         result_workflow.append({"type": "start_while", "condition": node.test.dumps()})
@@ -78,7 +136,7 @@ class ScriptSplitter:
                         result_workflow[0]['variables'].append(iterator['name'] + "_var")
                         result_workflow[0]['variables'].append(iterator['name'] + "_elem")
                         result_workflow.append({"type": "start_for", "iterator": iterator['name'], "iterator_script": iterator['name']+".js"})
-                        self.iterators.append(iterator)
+                        self.context.iterators.append(iterator)
                         sub_parts = self.build_base_script(node, code_blocks, result_workflow)
                         script_parts.extend(sub_parts)
                         result_workflow.append({"type": "end_for"})
@@ -96,56 +154,170 @@ class ScriptSplitter:
                 else:
                     pass
             else:
-                code_block = code_blocks[which_code_block(node, code_blocks)]
-                if code_block not in self.integrated_blocks:
-                    part = self.gen_part_from_block(code_block)
-                    script_parts.append(part)
-                    result_workflow.append({"type": "task", "file": part['name']})
-                self.integrated_blocks.append(code_block)
+                if block_id not in self.context.integrated_blocks:
+                    code_block = code_blocks[block_id]
+                    parameters, return_variables = self.compute_interface(code_block)
+                    # Tiny classical glue code is evaluated by the workflow engine instead of a separate service
+                    script_task = self.gen_script_task_from_block(code_block, parameters, return_variables)
+                    if script_task is not None:
+                        step = script_task
+                        return_variables = script_task['return_variables']
+                    else:
+                        part = self.gen_part_from_block(code_block, parameters, return_variables)
+                        # Identical parts are generated only once and referenced by several tasks of the workflow
+                        if part['name'] not in self.context.generated_parts:
+                            self.context.generated_parts[part['name']] = part
+                            script_parts.append(part)
+                        else:
+                            app.logger.info("Reuse identical part %s" % part['name'])
+                        step = {"type": "task", "file": part['name']}
+                    result_workflow.append(step)
+                    self.context.step_interfaces[id(step)] = (frozenset(parameters), frozenset(return_variables))
+                self.context.integrated_blocks.add(block_id)
         return script_parts
 
     def gen_iterator(self, list):
         iterator_name = "it_" + ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
 
-        iterator_template_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates", "iterator_script.js")
-        with open(iterator_template_path, "r") as file:
-            iterator_template = file.read()
-        iterator_template = iterator_template.replace("### LIST ###", list)
-        iterator_template = iterator_template.replace("### ITERATOR VARIABLE ###", iterator_name + "_var")
-        iterator_template = iterator_template.replace("### ITERATOR ELEMENT ###", iterator_name + "_elem")
+        iterator_template = ITERATOR_SCRIPT.render({"### LIST ###": list,
+                                                    "### ITERATOR VARIABLE ###": iterator_name + "_var",
+                                                    "### ITERATOR ELEMENT ###": iterator_name + "_elem"})
 
         return {'name': iterator_name, 'file': iterator_template}
 
-    def gen_part_from_block(self, code_block):
-        part = {'name': "part_" + ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))}
+    def gen_part_from_block(self, code_block, parameters, return_variables):
+        part = {}
 
-        # TODO only import the needed packages
-        preamble = self.all_imports[:]
+        # Only import the modules and symbols used by the code block
+        used_names = set()
+        for node in code_block:
+            used_names.update(get_names(node))
+        preamble = self.IMPORT_PRUNER.prune(used_names)
+        import_code = "\n".join([node.dumps() for node in preamble] + [get_import_code(code_block)])
 
-        # Compute list of parameters
-        parameters = self.compute_parameters(code_block)
         app.logger.info("Call arguments for code block: %s" % parameters)
 
-        # Compute list of return variables
-        return_variables = self.compute_return_variables(code_block)
-        self.all_possible_return_variables.extend(return_variables)
-
         # Generate new method from code block and append to result script
         method_name = "main"
-        created_method = create_method(method_name, code_block, parameters, return_variables)
-        app.logger.debug("Created method:\n%s" % created_method.dumps())
+        if script_ir.is_ir(self.ROOT_SCRIPT):
+            created_method = script_ir.create_method(method_name, code_block, parameters, return_variables)
+        else:
+            created_method = create_method(method_name, code_block, parameters, return_variables)
+        app.logger.debug("Created method:\n%s", created_method)
         preamble.append(created_method)
         part['app.py'] = preamble
 
-        part['requirements.txt'] = self.REQUIREMENTS
+        # Only install the distributions providing the modules imported by the part or needed to unpickle its parameters
+        parameter_modules = self.get_parameter_modules(parameters)
+        if self.REQUIREMENTS_PRUNER is not None and parameter_modules is not None:
+            part['requirements.txt'] = self.REQUIREMENTS_PRUNER.prune(import_code, parameter_modules)
+        else:
+            part['requirements.txt'] = add_default_requirements(self.REQUIREMENTS)
 
-        part['polling_agent.py'] = generate_polling_agent(parameters, return_variables)
+        # Name the part by its content, thus, identical parts of one or several jobs get the same name
+        content_hash = part_content_hash(part['app.py'], parameters, return_variables, part['requirements.txt'])
+        part['name'] = "part_" + content_hash[:12]
+        part['polling_agent.py'] = generate_polling_agent(parameters, return_variables, content_hash[:12].upper())
 
         return part
 
+    def gen_script_task_from_block(self, code_block, parameters, return_variables):
+        """Script task of the workflow for the code block or None if it has to be executed by a part."""
+        if self.JSON_VARIABLES is None:
+            return None
+        code = get_script_task_code(code_block, self.SPLITTING_LABELS, self.JSON_VARIABLES, parameters,
+                                    return_variables)
+        if code is None:
+            return None
+        # Lists and dicts modified in place are handed back to the workflow, too
+        return_variables = return_variables + [variable for variable in get_modified_variables(code)
+                                               if variable not in return_variables]
+        app.logger.info("Generate script task for code block with call arguments: %s" % parameters)
+        return {"type": "script", "name": script_task_name(code, parameters, return_variables), "code": code,
+                "parameters": parameters, "return_variables": return_variables}
+
+    def get_parameter_modules(self, parameters):
+        """Modules which may be needed to unpickle the parameters or None if they cannot be determined."""
+        if self.VARIABLE_MODULES is None:
+            return None
+        parameter_modules = set()
+        for parameter in parameters:
+            modules = self.VARIABLE_MODULES.get(parameter, set())
+            if modules is None:
+                app.logger.warning("Could not determine the modules of parameter %s... Use all requirements"
+                                   % parameter)
+                return None
+            parameter_modules |= modules
+        return parameter_modules
+
+    def compute_variable_modules(self, code_blocks):
+        """
+        Modules which may be needed to unpickle the value of each variable assigned by a code block, i.e., the modules
+        imported by the statements assigning it and, as their values may be derived from the variables they read, the
+        modules needed for these variables. None if the imports of an assigning statement cannot be determined.
+        """
+        modules = []
+        reads = []
+        assigning_statements = {}
+        for code_block in code_blocks:
+            for node in code_block:
+                if node.type in ['comment', 'endl']:
+                    continue
+                used_names = get_names(node)
+                code = [import_node.dumps() for import_node in self.IMPORT_PRUNER.prune(used_names)]
+                code.append(get_import_code([node]))
+                imported_modules = [get_imported_modules(line) for line in code]
+                for name in get_assigned_names([node]):
+                    assigning_statements.setdefault(name, set()).add(len(modules))
+                modules.append(None if None in imported_modules else set().union(*imported_modules))
+                reads.append(used_names)
+
+        # Add the modules of the statements assigning the variables read by each statement until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(modules)):
+                if modules[i] is None:
+                    continue
+                for j in set().union(*(assigning_statements.get(name, set()) for name in reads[i])):
+                    if modules[j] is None:
+                        modules[i] = None
+                        changed = True
+                        break
+                    if not modules[j] <= modules[i]:
+                        modules[i] |= modules[j]
+                        changed = True
+
+        variable_modules = {}
+        for name, statements in assigning_statements.items():
+            variable_modules[name] = set()
+            for i in statements:
+                if modules[i] is None:
+                    variable_modules[name] = None
+                    break
+                variable_modules[name] |= modules[i]
+        return variable_modules
+
+    def compute_interface(self, code_block):
+        """Parameters and return variables of the part or script task of the code block."""
+        parameters = self.compute_parameters(code_block)
+        if self.RETURN_VARIABLES is not None:
+            return_variables = self.RETURN_VARIABLES[id(code_block)]
+            parameters = self.compute_live_parameters(code_block, parameters, return_variables)
+        else:
+            return_variables = self.compute_return_variables(code_block)
+            self.context.all_possible_return_variables.extend(return_variables)
+        return parameters, return_variables
+
     def identify_code_blocks(self, nodes):
+        """Table of the code blocks of the given nodes, which are split into parts."""
+        return CodeBlocks(self.find_code_blocks(nodes))
+
+    def find_code_blocks(self, nodes):
         list_of_all_code_blocks = []
         code_block = []
+        # Positions in the code block where the label changes, which are only cut when closing the code block
+        cut_points = []
         current_label = None
         prevent_split = 0
         for node in nodes:
@@ -156,21 +328,23 @@ class ScriptSplitter:
             # Handle loops (only if they are hybrid – otherwise they are labeled Quantum/Classical)
             if label == Labels.LOOP:
                 # Close current code block and start new one
-                list_of_all_code_blocks.append(code_block[:])
+                list_of_all_code_blocks.extend(self.close_code_block(code_block, cut_points))
                 code_block = []
+                cut_points = []
                 # Compute code blocks recursively and add to result
-                sub_blocks = self.identify_code_blocks(node)
+                sub_blocks = self.find_code_blocks(node)
                 list_of_all_code_blocks.extend(sub_blocks)
                 continue
 
             # Handle if-else-blocks (only if they are hybrid - otherwise they are labels Quantum/Classical)
             if label == Labels.IF_ELSE_BLOCK:
                 # Close current code block and start new one
-                list_of_all_code_blocks.append(code_block[:])
+                list_of_all_code_blocks.extend(self.close_code_block(code_block, cut_points))
                 code_block = []
+                cut_points = []
                 # Compute code blocks recursively and add to result
                 for block in node.value:
-                    sub_blocks = self.identify_code_blocks(block)
+                    sub_blocks = self.find_code_blocks(block)
                     list_of_all_code_blocks.extend(sub_blocks)
                 continue
 
@@ -196,9 +370,14 @@ class ScriptSplitter:
             # or outside protected block (prevented_split <= 0)
             if prevent_split != 1:
                 prevent_split -= 1
-                if len(code_block) > 0 and (label == Labels.FORCE_SPLIT or label != current_label):
-                    list_of_all_code_blocks.append(code_block[:])
+                if len(code_block) > 0 and label != Labels.FORCE_SPLIT and label != current_label \
+                        and app.config['PARTITIONING'] == 'optimal':
+                    # Leave it to the optimizer whether to split at label changes
+                    cut_points.append(len(code_block))
+                elif len(code_block) > 0 and (label == Labels.FORCE_SPLIT or label != current_label):
+                    list_of_all_code_blocks.extend(self.close_code_block(code_block, cut_points))
                     code_block = []
+                    cut_points = []
                 if label == Labels.FORCE_SPLIT:
                     current_label = None
                 else:
@@ -208,10 +387,18 @@ class ScriptSplitter:
             code_block.append(node)
 
         # Add last code block
-        list_of_all_code_blocks.append(code_block[:])
+        list_of_all_code_blocks.extend(self.close_code_block(code_block, cut_points))
 
         return list_of_all_code_blocks
 
+    def close_code_block(self, code_block, cut_points):
+        """Split the code block at the cut points chosen by the optimizer, if any."""
+        if not cut_points:
+            return [code_block[:]]
+        if self.COST_MODEL is None:
+            self.COST_MODEL = get_cost_model(self.ROOT_SCRIPT, ImportSymbolTable(self.ROOT_SCRIPT))
+        return partition(code_block, cut_points, self.SPLITTING_LABELS, self.COST_MODEL, self.context.threshold)
+
     def get_assigned_variables(self, result, code_block):
         for line in code_block:
             if line.type == "assignment":
@@ -223,23 +410,6 @@ class ScriptSplitter:
             if line.type in ['while', 'for']:
                 self.get_assigned_variables(result, line.value)
 
-    def find_used_variables_in_other_code_blocks(self, line, code_block, assignment_nodes, result):
-        if line in code_block:
-            return
-        if line.type == "ifelseblock":
-            for block in line.value:
-                for x in block.value:
-                    self.find_used_variables_in_other_code_blocks(x, code_block, assignment_nodes, result)
-        elif line.type in ['while', 'for']:
-            for x in line.value:
-                self.find_used_variables_in_other_code_blocks(x, code_block, assignment_nodes, result)
-        else:
-            for variable in assignment_nodes:
-                if str(variable) in result:
-                    continue
-                if is_used_in_line(variable, line):
-                    result.append(str(variable))
-
     def compute_return_variables(self, code_block):
         app.logger.debug("Compute return variables")
 
@@ -254,48 +424,80 @@ class ScriptSplitter:
 
         app.logger.debug("All initialized variables: %s" % assignment_nodes)
 
-        result = []
-        for line in self.ROOT_SCRIPT:
-            self.find_used_variables_in_other_code_blocks(line, code_block, assignment_nodes, result)
+        # Variables used outside of the code block, ordered by their first use
+        if self.NAME_INDEX is None:
+            self.NAME_INDEX = NameIndex(self.ROOT_SCRIPT)
+        result = self.NAME_INDEX.used_outside(assignment_nodes, code_block)
+
+        # Only return variables which may be read before they are re-assigned
+        if self.LIVENESS is not None:
+            live_out = self.LIVENESS.get_live_out(code_block)
+            result = [variable for variable in result if variable in live_out] + \
+                     [variable for variable in assignment_nodes if variable in live_out and variable not in result]
 
         app.logger.debug("Return variables: %s" % result)
 
         return result
 
-    def compute_parameters(self, code_block):
+    def compute_parameters(self, code_block, return_variable_positions=None):
         parameters = []
 
-        app.logger.debug("Compute parameters for %s" % code_block)
+        # Index of each variable returned by any part to keep the order of the parameters
+        if return_variable_positions is None:
+            return_variable_positions = {}
+            for variable in self.context.all_possible_return_variables:
+                return_variable_positions.setdefault(str(variable), len(return_variable_positions))
+
+        app.logger.debug("Compute parameters for %s", code_block)
         try:
             for line in code_block:
-                app.logger.debug("Scan line for parameters: %s" % line)
+                app.logger.debug("Scan line for parameters: %s", line)
                 if line.type == "assignment":
                     app.logger.debug("Is an assignment... call recursively with right part.")
-                    param_list = self.compute_parameters(line.value)
+                    param_list = self.compute_parameters(line.value, return_variable_positions)
                     for element in param_list:
-                        app.logger.debug("element %s in list %s" % (element, param_list))
                         if element not in parameters:
                             parameters.append(element)
                     continue
                 if line.type in ['comment', 'endl', 'import']:
                     continue
-                app.logger.debug("All possible return variables: %s" % self.all_possible_return_variables)
-                for variable in self.all_possible_return_variables:
-                    if str(variable) in parameters:
-                        continue
-                    app.logger.debug("Check if %s is used in line %s. (%s)" % (variable, repr(line), is_used_in_line(variable, line)))
-                    if is_used_in_line(variable, line):
-                        parameters.append(str(variable))
+                used_variables = sorted(return_variable_positions.keys() & get_names(line),
+                                        key=return_variable_positions.get)
+                app.logger.debug("Possible return variables used in line: %s", used_variables)
+                for variable in used_variables:
+                    if variable not in parameters:
+                        parameters.append(variable)
         except TypeError:
             app.logger.debug("code_block is not iterable")
             # TODO: If a line.value is a simple int or string, recursive call will result in wrong type which is not indexable
 
         return parameters
 
+    def compute_live_parameters(self, code_block, parameters, return_variables):
+        """
+        Restrict the parameters to variables read before they are assigned in the code block, which are returned by a
+        part that may be executed before it.
+        """
+        live_in = self.LIVENESS.get_live_in(code_block, return_variables) & self.LIVENESS.get_defined_in(code_block)
+        result = [parameter for parameter in parameters if parameter in live_in]
+
+        # Variables which are modified in place, e.g., 'x[0] = 1' or 'x += 1', or returned without being assigned on
+        # every path through the code block are read by the code block, too
+        return_variable_positions = {}
+        for variable in self.context.all_possible_return_variables:
+            return_variable_positions.setdefault(str(variable), len(return_variable_positions))
+        result.extend(sorted((live_in & return_variable_positions.keys()) - set(result),
+                             key=return_variable_positions.get))
+
+        app.logger.debug("Live parameters: %s", result)
+        return result
 
-def is_used_in_line(variable, line):
-    found = line.find_all("NameNode", value=variable)
-    return len(found) > 0
+
+def part_content_hash(nodes, parameters, return_variables, requirements):
+    """Hash of the normalized code, i.e., without trailing whitespace, and the interface of a part."""
+    code = "\n".join(line.rstrip() for node in nodes for line in node.dumps().splitlines())
+    return hashlib.sha256("\0".join([code, ",".join(parameters), ",".join(return_variables),
+                                      requirements]).encode("utf-8")).hexdigest()
 
 
 def create_method(method_name, code_block, parameters, return_variables):
@@ -316,9 +518,3 @@ def create_method(method_name, code_block, parameters, return_variables):
 
     return method
 
-
-def which_code_block(node, code_blocks):
-    for i in range(len(code_blocks)):
-        if node in code_blocks[i]:
-            return i
-    return -1
@@ -0,0 +1,251 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import ast
+import hashlib
+import textwrap
+
+from app import app
+from app.script_splitting.Labels import Labels
+
+# Builtins script tasks may call, which have no side effects and return JSON-serializable values for JSON-serializable
+# arguments
+JSON_BUILTINS = {'abs', 'all', 'any', 'bool', 'divmod', 'float', 'int', 'len', 'list', 'max', 'min', 'pow', 'round',
+                 'sorted', 'str', 'sum'}
+# Builtins returning iterators, which may only be passed to the builtins above, e.g., 'list(range(n))'
+ITERATOR_BUILTINS = {'enumerate', 'range', 'reversed', 'zip'}
+# Labels of the nodes of code blocks which may be evaluated by script tasks, i.e., classical code and comments
+SCRIPT_TASK_LABELS = [Labels.CLASSICAL, Labels.NO_CODE, Labels.FORCE_SPLIT, Labels.START_PREVENT_SPLIT,
+                      Labels.END_PREVENT_SPLIT, None]
+# Methods of lists which only modify the list itself
+LIST_METHODS = {'append', 'extend', 'insert'}
+
+
+def is_json_expression(expression, json_names, iterator_allowed=False):
+    """Whether the expression evaluates to a JSON-serializable value without side effects."""
+    if isinstance(expression, ast.Constant):
+        return expression.value is None or isinstance(expression.value, (str, int, float, bool))
+    if isinstance(expression, ast.Name):
+        return expression.id in json_names
+    if isinstance(expression, ast.BinOp):
+        return is_json_expression(expression.left, json_names) and is_json_expression(expression.right, json_names)
+    if isinstance(expression, ast.UnaryOp):
+        return is_json_expression(expression.operand, json_names)
+    if isinstance(expression, ast.BoolOp):
+        return all(is_json_expression(value, json_names) for value in expression.values)
+    if isinstance(expression, ast.Compare):
+        return all(is_json_expression(value, json_names) for value in [expression.left] + expression.comparators)
+    if isinstance(expression, ast.IfExp):
+        return all(is_json_expression(value, json_names)
+                   for value in [expression.test, expression.body, expression.orelse])
+    if isinstance(expression, ast.List):
+        return all(is_json_expression(element, json_names) for element in expression.elts)
+    if isinstance(expression, ast.Dict):
+        return all(isinstance(key, ast.Constant) and isinstance(key.value, str) for key in expression.keys) \
+               and all(is_json_expression(value, json_names) for value in expression.values)
+    if isinstance(expression, ast.Subscript):
+        return is_json_expression(expression.value, json_names) and is_json_expression(expression.slice, json_names)
+    if isinstance(expression, ast.Index):
+        # Subscripts are wrapped into an index node before Python 3.9
+        return is_json_expression(expression.value, json_names)
+    if isinstance(expression, ast.Slice):
+        return all(value is None or is_json_expression(value, json_names)
+                   for value in [expression.lower, expression.upper, expression.step])
+    if isinstance(expression, ast.Call) and isinstance(expression.func, ast.Name) and not expression.keywords:
+        if expression.func.id in JSON_BUILTINS:
+            return all(is_json_expression(argument, json_names, iterator_allowed=True) for argument in expression.args)
+        if expression.func.id in ITERATOR_BUILTINS and iterator_allowed:
+            return all(is_json_expression(argument, json_names, iterator_allowed=True) for argument in expression.args)
+    return False
+
+
+def get_bound_names(target):
+    """Names bound by assigning to the target, i.e., the names of the target and of the values of subscripts."""
+    while isinstance(target, ast.Subscript):
+        target = target.value
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return [name for element in target.elts for name in get_bound_names(element)]
+    return []
+
+
+def is_json_target(target, json_names):
+    """Whether assigning to the target only changes plain variables or subscripts of JSON-serializable variables."""
+    if isinstance(target, ast.Name):
+        return True
+    if isinstance(target, ast.Subscript):
+        return isinstance(target.value, ast.Name) and target.value.id in json_names \
+               and is_json_expression(target.slice, json_names)
+    return False
+
+
+class JsonVariables:
+    """
+    Variables of a script which only hold JSON-serializable values, i.e., which are only assigned values computed from
+    literals and other such variables by operators and side effect free builtins. These variables are handed over to
+    the workflow engine as basic types or JSON and, thus, can be read and written by script tasks of the workflow.
+    """
+
+    def __init__(self, script):
+        # Checks of all statements binding each name, whether they bind a JSON-serializable value given the JSON names
+        self.bindings = {}
+        try:
+            tree = ast.parse(script.dumps())
+        except SyntaxError:
+            app.logger.warning('Could not parse script to determine JSON-serializable variables')
+            tree = ast.Module(body=[], type_ignores=[])
+        self.add_statements(tree.body)
+
+        # Start with all names and remove names with bindings of other values until no more names are removed
+        self.names = set(self.bindings)
+        changed = True
+        while changed:
+            changed = False
+            for name, checks in self.bindings.items():
+                if name in self.names and not all(check(self.names) for check in checks):
+                    self.names.discard(name)
+                    changed = True
+        app.logger.debug('JSON-serializable variables: %s', sorted(self.names))
+
+    def bind(self, name, check):
+        self.bindings.setdefault(name, []).append(check)
+
+    def add_statements(self, statements):
+        for statement in statements:
+            if isinstance(statement, ast.Assign):
+                for target in statement.targets:
+                    value = statement.value
+                    for name in get_bound_names(target):
+                        if isinstance(target, (ast.Name, ast.Subscript)):
+                            self.bind(name, lambda names, t=target, v=value: is_json_target(t, names)
+                                      and is_json_expression(v, names))
+                        else:
+                            # Unpacking of sequences is not analyzed
+                            self.bind(name, lambda names: False)
+            elif isinstance(statement, (ast.AugAssign, ast.AnnAssign)) and statement.value is not None:
+                for name in get_bound_names(statement.target):
+                    self.bind(name, lambda names, t=statement.target, v=statement.value: is_json_target(t, names)
+                              and is_json_expression(v, names))
+            elif isinstance(statement, ast.For):
+                for name in get_bound_names(statement.target):
+                    self.bind(name, lambda names, t=statement.target, v=statement.iter: isinstance(t, ast.Name)
+                              and is_json_expression(v, names, iterator_allowed=True))
+                self.add_statements(statement.body + statement.orelse)
+            elif isinstance(statement, (ast.While, ast.If)):
+                self.add_statements(statement.body + statement.orelse)
+            elif isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call) \
+                    and isinstance(statement.value.func, ast.Attribute) \
+                    and isinstance(statement.value.func.value, ast.Name):
+                # Objects modified by calling their methods, e.g., 'values.append(x)'
+                call = statement.value
+                self.bind(call.func.value.id, lambda names, c=call: c.func.attr in LIST_METHODS and not c.keywords
+                          and all(is_json_expression(argument, names) for argument in c.args))
+            else:
+                # Any other statement binding names, e.g., imports, definitions or 'with' statements
+                for node in ast.walk(statement):
+                    if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                        self.bind(node.id, lambda names: False)
+                    elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                        self.bind(node.name, lambda names: False)
+                    elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                        for alias in node.names:
+                            self.bind((alias.asname or alias.name).split('.')[0], lambda names: False)
+
+
+def get_sources(code_block):
+    """Source code of the statements of the code block, each without the indentation of the code block."""
+    return [textwrap.dedent(node.dumps()).strip() for node in code_block if node.type not in ['comment', 'endl']]
+
+
+def parse_statements(sources):
+    """Python ast of the statements or None if a statement cannot be parsed on its own."""
+    statements = []
+    for source in sources:
+        try:
+            statements.extend(ast.parse(source).body)
+        except SyntaxError:
+            return None
+    return statements
+
+
+def is_glue_statement(statement, json_names):
+    if isinstance(statement, ast.Pass):
+        return True
+    if isinstance(statement, ast.Assign):
+        return all(is_json_target(target, json_names) for target in statement.targets) \
+               and is_json_expression(statement.value, json_names)
+    if isinstance(statement, ast.AugAssign):
+        return is_json_target(statement.target, json_names) and is_json_expression(statement.value, json_names)
+    if isinstance(statement, ast.If):
+        return is_json_expression(statement.test, json_names) \
+               and all(is_glue_statement(child, json_names) for child in statement.body + statement.orelse)
+    if isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call) \
+            and isinstance(statement.value.func, ast.Attribute) and isinstance(statement.value.func.value, ast.Name):
+        call = statement.value
+        return call.func.value.id in json_names and call.func.attr in LIST_METHODS and not call.keywords \
+            and all(is_json_expression(argument, json_names) for argument in call.args)
+    return False
+
+
+def get_script_task_code(code_block, labels, json_variables, parameters, return_variables):
+    """
+    Source code of a script task evaluated by the workflow engine for the code block or None if the code block does
+    not qualify, i.e., if it contains quantum code, statements with side effects besides modifying its variables,
+    calls of other than a few builtins, or variables which are not JSON-serializable.
+    """
+    if any(labels.get(node) not in SCRIPT_TASK_LABELS for node in code_block):
+        return None
+    if not set(parameters) <= json_variables.names or not set(return_variables) <= json_variables.names:
+        return None
+    sources = get_sources(code_block)
+    statements = parse_statements(sources)
+    if not statements:
+        return None
+
+    # Only parameters and variables assigned by the code block itself are available to the script task
+    available = set(parameters) | {name for statement in statements for node in ast.walk(statement)
+                                   if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+                                   for name in [node.id]}
+    names = json_variables.names & available
+    if not all(is_glue_statement(statement, names) for statement in statements):
+        return None
+    return '\n'.join(sources)
+
+
+def get_modified_variables(code):
+    """
+    Variables the code of a script task modifies in place, i.e., receivers of list methods and values of subscripts
+    assigned to, which have to be returned like assigned variables.
+    """
+    names = []
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+            names.append(node.func.value.id)
+        elif isinstance(node, (ast.Assign, ast.AugAssign)):
+            for target in node.targets if isinstance(node, ast.Assign) else [node.target]:
+                if isinstance(target, ast.Subscript):
+                    names.extend(get_bound_names(target))
+    return list(dict.fromkeys(names))
+
+
+def script_task_name(code, parameters, return_variables):
+    content = '\0'.join([code, ','.join(parameters), ','.join(return_variables)])
+    return 'script_' + hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
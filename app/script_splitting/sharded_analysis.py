@@ -0,0 +1,80 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app import app
+from app.script_splitting.Labels import Labels
+from app.script_splitting.analysis_cache import labeled_nodes
+from app.script_splitting.script_analyzer import get_left_most_identifier
+from app.script_splitting.splitting_context import SplittingContext
+
+# Analyzer and shards of the script being labeled, which forked worker processes inherit instead of re-parsing shards
+sharded_script = None
+
+
+def use_sharded_analysis(script):
+    # Worker processes inherit the parsed script by forking, which is not available on all platforms
+    return app.config['ANALYSIS_WORKERS'] > 1 and len(script) > app.config['ANALYSIS_SHARD_SIZE'] \
+        and 'fork' in multiprocessing.get_all_start_methods()
+
+
+def label_shard(index):
+    """
+    Compute the initial labels of a shard in a worker process. Quantum objects of previous shards are taken into
+    account when stitching the shards together, thus, each shard is labeled with an empty context.
+    """
+    script_analyzer, shards = sharded_script
+    script_analyzer.context = SplittingContext()
+    labels = script_analyzer.get_initial_labels(shards[index])
+    return [labels[node].name for node in labeled_nodes(shards[index])]
+
+
+def get_initial_labels(script_analyzer, script):
+    """Compute the initial labels of the script by labeling shards of top level statements in parallel."""
+    global sharded_script
+    statements = list(script)
+    shard_size = app.config['ANALYSIS_SHARD_SIZE']
+    shards = [statements[i:i + shard_size] for i in range(0, len(statements), shard_size)]
+    app.logger.info('Label %d shards using %d worker processes' % (len(shards), app.config['ANALYSIS_WORKERS']))
+
+    sharded_script = (script_analyzer, shards)
+    try:
+        with ProcessPoolExecutor(max_workers=app.config['ANALYSIS_WORKERS'],
+                                 mp_context=multiprocessing.get_context('fork')) as executor:
+            results = list(executor.map(label_shard, range(len(shards))))
+    finally:
+        sharded_script = None
+
+    # Stitch shards together: objects assigned quantum values in previous shards are quantum objects, too
+    labels = {}
+    for shard, shard_labels in zip(shards, results):
+        for node, label in zip(labeled_nodes(shard), shard_labels):
+            label = Labels[label]
+            if label == Labels.CLASSICAL and node.type in ['assignment', 'atomtrailers']:
+                left_most_identifier = get_left_most_identifier(node.value if node.type == 'assignment' else node)
+                if left_most_identifier is not None \
+                        and str(left_most_identifier) in script_analyzer.context.quantum_objects:
+                    label = Labels.QUANTUM
+            labels[node] = label
+            if node.type == 'assignment' and label == Labels.QUANTUM:
+                script_analyzer.context.quantum_objects.append(node.target.value)
+
+    return labels
@@ -0,0 +1,84 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+from app import app
+
+
+class QuantumObjects(list):
+    """List of objects assigned quantum values which additionally indexes names for constant time membership tests."""
+
+    def __init__(self, iterable=()):
+        super().__init__()
+        self.names = set()
+        self.extend(iterable)
+
+    def append(self, quantum_object):
+        super().append(quantum_object)
+        if isinstance(quantum_object, str):
+            self.names.add(quantum_object)
+
+    def extend(self, quantum_objects):
+        for quantum_object in quantum_objects:
+            self.append(quantum_object)
+
+    def __contains__(self, item):
+        if isinstance(item, str) and item in self.names:
+            return True
+        # Targets of tuple assignments etc. are no plain names and have to be compared one by one
+        return any(quantum_object == item for quantum_object in self if not isinstance(quantum_object, str))
+
+
+class CodeBlocks(list):
+    """
+    Table of the code blocks of a script, whose positions serve as stable block ids, which additionally maps the
+    identity of each node to the id of its code block for constant time lookups.
+    """
+
+    def __init__(self, code_blocks=()):
+        super().__init__(code_blocks)
+        self.block_of = {id(node): i for i, code_block in enumerate(self) for node in code_block}
+
+    def get_block_id(self, node):
+        """Id of the code block containing the node or -1 if it is not contained in any code block."""
+        return self.block_of.get(id(node), -1)
+
+
+class SplittingContext:
+    """
+    State of the analysis and splitting of one script. Each job uses its own context, thus, the analysis and splitting
+    of multiple scripts can run in the same process without affecting each other.
+    """
+
+    def __init__(self, threshold=None):
+        # Threshold of this job for the cost of classical code allowed in quantum parts
+        self.threshold = threshold if threshold is not None else app.config['SPLITTING_THRESHOLD']
+        # Objects which are assigned quantum values, e.g., circuits
+        self.quantum_objects = QuantumObjects()
+        # Ids of the code blocks for which a part was generated already
+        self.integrated_blocks = set()
+        # Generated parts by their content-addressed names
+        self.generated_parts = {}
+        # Variables returned by any of the generated parts
+        self.all_possible_return_variables = []
+        # Variables read and written by each part or script task of the workflow by the id of its step
+        self.step_interfaces = {}
+        # Iterators generated for hybrid for-loops
+        self.iterators = []
+        # Import statements of the script added to each part
+        self.all_imports = []
@@ -0,0 +1,61 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+from app import app
+
+
+class ImportSymbolTable:
+    """
+    Maps every name bound by an import of a script to the dotted path of the imported module or symbol.
+    The table is built in one pass over the imports, so resolving a name does not depend on the script size.
+
+    Imports are resolved for the whole script independent of their position, i.e., a name may be used before the
+    import binding it. If a name is bound by several imports, the first import in the script wins and later imports
+    do not shadow it. Aliases of 'import x as y' statements take precedence over names of 'from a.b import c'
+    statements. For 'from' imports, the imported name is bound, not its alias.
+    """
+
+    def __init__(self, script):
+        self.as_imports = {}
+        self.from_imports = {}
+
+        # E.g.: import qiskit as qs --> qs: qiskit
+        for as_import in script.find_all('import'):
+            for dotted_as_name_node in as_import.value:
+                alias = dotted_as_name_node.target
+                if isinstance(alias, str) and alias not in self.as_imports:
+                    self.as_imports[alias] = [value.value for value in dotted_as_name_node.value
+                                              if value.type == 'name']
+
+        # E.g.: from qiskit.visualization import plot_histogram --> plot_histogram: qiskit.visualization.plot_histogram
+        for from_import in script.find_all('from_import'):
+            module = [value.value for value in from_import.value if value.type == 'name']
+            for target in from_import.targets:
+                name = str(target.value)
+                if name not in self.from_imports:
+                    self.from_imports[name] = module + [target.value]
+
+        app.logger.debug('Import symbol table: %s, %s' % (self.as_imports, self.from_imports))
+
+    def resolve(self, line_value):
+        """Return the module path of the import binding the given identifier or an empty list if there is none."""
+        if hasattr(line_value, 'value') and isinstance(line_value.value, str) and line_value.value in self.as_imports:
+            return self.as_imports[line_value.value][:]
+        return self.from_imports.get(str(line_value), [])[:]
@@ -0,0 +1,96 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+import os
+import re
+import threading
+
+from app import app
+
+TEMPLATE_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates")
+
+
+class Template:
+    """
+    Template file which is read and split at its placeholders once, and rendered by joining the literal segments with
+    the values of the placeholders in a single pass. The file is only read again if its modification time changes.
+    """
+
+    def __init__(self, name, placeholders=()):
+        self.path = os.path.join(TEMPLATE_FOLDER, name)
+        self.placeholders = placeholders
+        self.pattern = re.compile('|'.join(re.escape(placeholder) for placeholder in placeholders)) \
+            if placeholders else None
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.segments = ()
+        self.load()
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "r") as file:
+            content = file.read()
+
+        # Alternating literal text and placeholders, i.e., placeholders are at odd positions
+        if self.pattern is None:
+            segments = (content,)
+        else:
+            segments = []
+            position = 0
+            for match in self.pattern.finditer(content):
+                segments.append(content[position:match.start()])
+                segments.append(match.group())
+                position = match.end()
+            segments.append(content[position:])
+        self.segments = tuple(segments)
+        self.mtime = mtime
+
+    def reload_if_changed(self):
+        with self.lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                app.logger.warning('Template %s is not available anymore... Keep previous version' % self.path)
+                return
+            if mtime != self.mtime:
+                app.logger.info('Reload changed template %s' % self.path)
+                self.load()
+
+    def render(self, values=None):
+        """Replace each placeholder by its value in the given dictionary."""
+        segments = self.segments
+        if len(segments) == 1:
+            return segments[0]
+        return ''.join([segment if i % 2 == 0 else values[segment] for i, segment in enumerate(segments)])
+
+
+# Templates of the generated files, which are loaded when the worker imports this module
+ITERATOR_SCRIPT = Template("iterator_script.js", ("### LIST ###", "### ITERATOR VARIABLE ###",
+                                                  "### ITERATOR ELEMENT ###"))
+POLLING_AGENT = Template("polling_agent_template.py", ("$ServiceNamePlaceholder", "### LOAD INPUT DATA ###",
+                                                       "### CALL SCRIPT PART ###", "### STORE OUTPUT DATA SECTION ###"))
+DOCKERFILE = Template("Dockerfile")
+TEMPLATES = [ITERATOR_SCRIPT, POLLING_AGENT, DOCKERFILE]
+
+
+def reload_changed_templates():
+    """Read templates again which were modified since they were loaded, e.g., while developing them."""
+    for template in TEMPLATES:
+        template.reload_if_changed()
@@ -20,7 +20,8 @@
 from os import listdir
 from tempfile import mkdtemp
 
-from app import db, app
+from app import db, app, tracing
+from app.profiling import Profile
 from rq import get_current_job
 
 from app.result_model import Result
@@ -28,21 +29,42 @@ import os
 from app.script_splitting import script_handler
 
 
-def qc_script_splitting_task(qc_script_url, requirements_url, knowledge_base_url, threshold):
+def qc_script_splitting_task(qc_script_url, requirements_url, knowledge_base_url, threshold, previous_job_id=None,
+                             profile=False):
     app.logger.info('Start task split_qc_script...')
 
     script_url = 'http://' + os.environ.get('FLASK_RUN_HOST') + ':' + os.environ.get('FLASK_RUN_PORT') + qc_script_url
     rq_url = 'http://' + os.environ.get('FLASK_RUN_HOST') + ':' + os.environ.get('FLASK_RUN_PORT') + requirements_url
     kb_url = 'http://' + os.environ.get('FLASK_RUN_HOST') + ':' + os.environ.get('FLASK_RUN_PORT') + knowledge_base_url
     if threshold is not None:
-        app.config['SPLITTING_THRESHOLD'] = int(threshold)
+        threshold = int(threshold)
 
-    # Call script handler to
-    script_splitting_result = script_handler.split_qc_script(script_url, rq_url, kb_url)
+    # Trace the phases of the job
+    trace = tracing.start_trace()
+    job = get_current_job()
+    if job.enqueued_at is not None and job.started_at is not None:
+        tracing.observe('queue_wait_seconds', (job.started_at - job.enqueued_at).total_seconds())
+
+    # Call script handler to split the script, profiling it only on request as profiling slows down the job
+    job_profile = Profile() if profile else None
+    try:
+        if job_profile is not None:
+            with job_profile.run():
+                script_splitting_result = script_handler.split_qc_script(script_url, rq_url, kb_url, previous_job_id,
+                                                                           threshold)
+        else:
+            script_splitting_result = script_handler.split_qc_script(script_url, rq_url, kb_url, previous_job_id,
+                                                                     threshold)
+    finally:
+        tracing.end_trace()
 
     # Build result using the zip file as parameter
-    result = Result.query.get(get_current_job().get_id())
+    result = Result.query.get(job.get_id())
     result.program = script_splitting_result
+    if trace is not None:
+        result.trace = trace.to_json()
+    if job_profile is not None:
+        result.profile = job_profile.to_zip()
 
     # Update database
     result.complete = True
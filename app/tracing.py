@@ -0,0 +1,127 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import contextlib
+import json
+import threading
+import time
+
+from app import app, metrics
+
+# Returned for spans if tracing is disabled, entering and leaving it costs next to nothing
+NO_SPAN = contextlib.nullcontext()
+
+current = threading.local()
+
+
+class Trace:
+    """
+    Timing spans of the phases of a splitting job and the sizes observed while running it. Observations of the metrics
+    are buffered and exported once the job ended, so that tracing does not wait for Redis in every span.
+    """
+
+    def __init__(self, start=None, depth=0):
+        self.start = start if start is not None else time.perf_counter()
+        self.spans = []
+        self.values = {}
+        self.observations = []
+        self.depth = depth
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        start = time.perf_counter()
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            duration = time.perf_counter() - start
+            self.spans.append(dict({'name': name, 'start': round(start - self.start, 6),
+                                    'duration': round(duration, 6), 'depth': self.depth}, **attributes))
+            self.observations.append(('qc_script_splitter_phase_duration_seconds', duration, {'phase': name}))
+
+    def observe(self, name, value):
+        self.values[name] = value
+        self.observations.append(('qc_script_splitter_' + name, value, None))
+
+    def flush(self):
+        """Export the buffered observations to the metrics."""
+        observations, self.observations = self.observations, []
+        metrics.observe_all(observations)
+
+    def to_json(self):
+        return json.dumps({'spans': sorted(self.spans, key=lambda span: span['start']), 'values': self.values})
+
+
+def start_trace():
+    """Start tracing the job executed by the current thread unless tracing is disabled."""
+    current.trace = Trace() if app.config['TRACING'] != 'off' else None
+    return current.trace
+
+
+def end_trace():
+    """Stop tracing the job executed by the current thread and export its metrics."""
+    trace = getattr(current, 'trace', None)
+    current.trace = None
+    if trace is not None:
+        trace.flush()
+    return trace
+
+
+def span(name, **attributes):
+    """Context measuring the duration of a phase of the current job, attributes are stored with the span."""
+    trace = getattr(current, 'trace', None)
+    if trace is None:
+        return NO_SPAN
+    return trace.span(name, **attributes)
+
+
+def fork():
+    """Trace for spans of the current job measured by another thread, which are added by join() afterwards."""
+    trace = getattr(current, 'trace', None)
+    if trace is None:
+        return None
+    return Trace(trace.start, trace.depth)
+
+
+@contextlib.contextmanager
+def attach(trace):
+    """Record the spans of the current thread in the given forked trace."""
+    previous = getattr(current, 'trace', None)
+    current.trace = trace
+    try:
+        yield
+    finally:
+        current.trace = previous
+
+
+def join(forked_trace):
+    """Add the spans of a forked trace to the trace of the current job."""
+    trace = getattr(current, 'trace', None)
+    if trace is not None and forked_trace is not None:
+        trace.spans.extend(forked_trace.spans)
+        trace.observations.extend(forked_trace.observations)
+
+
+def observe(name, value):
+    """Record a value of the current job, e.g., the script size, in the trace and the metrics."""
+    trace = getattr(current, 'trace', None)
+    if trace is not None:
+        trace.observe(name, value)
+
@@ -0,0 +1,113 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+"""
+Generator for synthetic hybrid quantum/classical scripts of a given size and shape.
+
+Usage: python -m benchmarks.generator [--statements 200] [--depth 2] [--quantum-ratio 0.5] [--variables 10]
+                                      [--import-style from] [--seed 0]
+"""
+
+import argparse
+import random
+
+# Header of the script and the names used to create circuits, execute them and call numpy for each import style
+IMPORT_STYLES = {
+    'from': ('from qiskit import QuantumCircuit, execute, Aer\nimport numpy as np\n',
+             'QuantumCircuit', 'execute', 'Aer', 'np'),
+    'alias': ('import qiskit as qs\nimport numpy as np\n',
+              'qs.QuantumCircuit', 'qs.execute', 'qs.Aer', 'np'),
+    'plain': ('import qiskit\nimport numpy\n',
+              'qiskit.QuantumCircuit', 'qiskit.execute', 'qiskit.Aer', 'numpy'),
+}
+
+
+class ScriptGenerator:
+    """
+    Generates scripts with the given number of simple statements, i.e., all statements besides if-/while-/for-blocks.
+    Blocks are nested up to the given depth, and the given ratio of statements operates on the quantum circuit.
+    """
+
+    def __init__(self, statements=200, depth=2, quantum_ratio=0.5, variables=10, import_style='from', seed=0):
+        self.statements = statements
+        self.depth = depth
+        self.quantum_ratio = quantum_ratio
+        self.variables = ['v%d' % i for i in range(max(variables, 1))]
+        self.header, self.circuit, self.execute, self.aer, self.numpy = IMPORT_STYLES[import_style]
+        self.rng = random.Random(seed)
+
+    def generate(self):
+        lines = [self.header.rstrip('\n'),
+                 'qc = %s(4, 4)' % self.circuit,
+                 "backend = %s.get_backend('qasm_simulator')" % self.aer]
+        lines.extend('%s = %d' % (variable, i) for i, variable in enumerate(self.variables))
+        remaining = [self.statements]
+        while remaining[0] > 0:
+            lines.extend(self.generate_statement(0, '', remaining))
+        return '\n'.join(lines) + '\n'
+
+    def variable(self):
+        return self.rng.choice(self.variables)
+
+    def generate_statement(self, depth, indentation, remaining):
+        kind = self.rng.random()
+        if depth < self.depth and kind < 0.1:
+            header = self.rng.choice(['if %s > 3:' % self.variable(), 'while %s < 3:' % self.variable(),
+                                      'for %s in range(3):' % self.variable()])
+            lines = [indentation + header]
+            for _ in range(self.rng.randint(1, 5)):
+                if remaining[0] <= 0 and len(lines) > 1:
+                    break
+                lines.extend(self.generate_statement(depth + 1, indentation + '    ', remaining))
+            return lines
+
+        remaining[0] -= 1
+        if self.rng.random() < self.quantum_ratio:
+            return [indentation + self.rng.choice([
+                'qc.h(%s %% 4)' % self.variable(),
+                'qc.cx(%s %% 4, (%s + 1) %% 4)' % (self.variable(), self.variable()),
+                'qc.measure(%s %% 4, %s %% 4)' % (self.variable(), self.variable()),
+                'counts = %s(qc, backend, shots=%d).result().get_counts()' % (self.execute, self.rng.randint(1, 1024)),
+            ])]
+        return [indentation + self.rng.choice([
+            '%s = %s + %s' % (self.variable(), self.variable(), self.variable()),
+            '%s = %s.sum([%s, %s])' % (self.variable(), self.numpy, self.variable(), self.variable()),
+            'print(%s)' % self.variable(),
+        ])]
+
+
+def generate_script(**parameters):
+    return ScriptGenerator(**parameters).generate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--statements', type=int, default=200, help='number of statements besides code blocks')
+    parser.add_argument('--depth', type=int, default=2, help='maximum nesting depth of if-/while-/for-blocks')
+    parser.add_argument('--quantum-ratio', type=float, default=0.5, help='ratio of statements using the circuit')
+    parser.add_argument('--variables', type=int, default=10, help='number of distinct classical variables')
+    parser.add_argument('--import-style', default='from', choices=sorted(IMPORT_STYLES))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(generate_script(statements=args.statements, depth=args.depth, quantum_ratio=args.quantum_ratio,
+                          variables=args.variables, import_style=args.import_style, seed=args.seed), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+
+"""
+Benchmark measuring the speedup of labeling a large generated script in shards by the number of worker processes.
+Labels of the sharded analysis are compared with a sequential analysis, and the benchmark fails if they differ or if
+the largest number of workers does not reach the given minimum speedup.
+
+Usage: python -m benchmarks.sharding [--statements 20000] [--workers 1,2,4] [--shard-size 500]
+                                     [--frontend redbaron] [--repeat 3] [--min-speedup 0]
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+basedir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "..")
+sys.path.insert(0, basedir)
+
+from app import app  # noqa: E402
+from app.script_splitting import sharded_analysis  # noqa: E402
+from app.script_splitting.analysis_cache import labeled_nodes  # noqa: E402
+from app.script_splitting.flattener import flatten  # noqa: E402
+from app.script_splitting.script_analyzer import ScriptAnalyzer  # noqa: E402
+from app.script_splitting.script_handler import parse_qc_script  # noqa: E402
+from benchmarks.generator import generate_script  # noqa: E402
+
+
+def label(script, knowledge_base_json, workers, repeat):
+    """
+    Initial labels of all labeled nodes of the script and the median seconds needed to compute them with the given
+    number of workers.
+    """
+    app.config['ANALYSIS_WORKERS'] = workers
+    seconds = []
+    for _ in range(repeat):
+        script_analyzer = ScriptAnalyzer(script, knowledge_base_json['white_list'], knowledge_base_json['black_list'])
+        start = time.perf_counter()
+        if workers > 1:
+            labels = sharded_analysis.get_initial_labels(script_analyzer, script)
+        else:
+            labels = script_analyzer.get_initial_labels(script)
+        seconds.append(time.perf_counter() - start)
+    return [labels.get(node) for node in labeled_nodes(script)], statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--statements', type=int, default=20000, help='number of statements of the generated script')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated numbers of worker processes')
+    parser.add_argument('--shard-size', type=int, default=500, help='number of top level statements per shard')
+    parser.add_argument('--frontend', default='redbaron', choices=['ast', 'redbaron'])
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs per number of workers')
+    parser.add_argument('--min-speedup', type=float, default=0,
+                        help='minimum speedup of the largest number of workers compared to one worker')
+    args = parser.parse_args()
+
+    app.logger.setLevel(logging.CRITICAL)
+    app.config['ANALYSIS_FRONTEND'] = args.frontend
+    app.config['ANALYSIS_SHARD_SIZE'] = args.shard_size
+    with open(os.path.join(basedir, 'knowledge_base', 'knowledge_base.json'), 'r') as file:
+        knowledge_base_json = json.load(file)
+    script = flatten(parse_qc_script(generate_script(statements=args.statements)))
+    workers = [int(worker) for worker in args.workers.split(',')]
+
+    # Output of the splitting pipeline is irrelevant for the benchmark
+    output = sys.stdout
+    failures = []
+    results = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        expected, sequential_seconds = label(script, knowledge_base_json, 1, args.repeat)
+        for worker_count in workers:
+            labels, seconds = label(script, knowledge_base_json, worker_count, args.repeat)
+            if labels != expected:
+                failures.append('labels of %d workers differ from the sequential analysis' % worker_count)
+            results.append({'workers': worker_count, 'seconds': seconds, 'speedup': sequential_seconds / seconds})
+            print(json.dumps(results[-1]), file=output, flush=True)
+
+    if results[-1]['speedup'] < args.min_speedup:
+        failures.append('speedup of %d workers is %.2f' % (results[-1]['workers'], results[-1]['speedup']))
+    for failure in failures:
+        print('FAILED: %s' % failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+"""
+Soak benchmark running thousands of splits back-to-back in one process, as a long-lived rq worker does.
+Fails if the memory retained between jobs or the latency per job grows during the second half of the run, i.e., after
+one-time allocations of the interpreter and caches are done. Concurrent jobs alternate between the given splitting
+thresholds and fail the benchmark if their splits differ from a sequential split with the same threshold.
+
+Usage: python -m benchmarks.soak [--jobs 2000] [--threads 1] [--script Example/qnn.py | --statements 200]
+                                 [--frontend ast] [--thresholds 10,0]
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+basedir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "..")
+sys.path.insert(0, basedir)
+
+from app import app  # noqa: E402
+from app.script_splitting.script_handler import do_the_split, parse_qc_script  # noqa: E402
+from benchmarks.generator import generate_script  # noqa: E402
+
+
+def split(script, requirements, knowledge_base_json, threshold):
+    result = do_the_split(parse_qc_script(script), requirements, knowledge_base_json, script, threshold=threshold)
+    return threshold, len(result['extracted_parts']), len(result['workflow.json'])
+
+
+def run_window(jobs, executor, script, requirements, knowledge_base_json, thresholds):
+    latencies = []
+    shapes = set()
+
+    def job(i):
+        start = time.perf_counter()
+        shape = split(script, requirements, knowledge_base_json, thresholds[i % len(thresholds)])
+        latencies.append(time.perf_counter() - start)
+        return shape
+
+    if executor is not None:
+        shapes.update(executor.map(job, range(jobs)))
+    else:
+        shapes.update(map(job, range(jobs)))
+    return latencies, shapes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=2000, help='number of splits')
+    parser.add_argument('--windows', type=int, default=10, help='number of windows to compare')
+    parser.add_argument('--threads', type=int, default=1, help='number of splits running concurrently')
+    parser.add_argument('--script', default=os.path.join(basedir, 'Example', 'qnn.py'))
+    parser.add_argument('--statements', type=int, help='split a generated script with this number of statements')
+    parser.add_argument('--frontend', default='ast', choices=['ast', 'redbaron'])
+    parser.add_argument('--thresholds', default='10',
+                        help='comma-separated splitting thresholds used by the jobs in turn, e.g., 10,0')
+    parser.add_argument('--max-latency-growth', type=float, default=1.5,
+                        help='maximum ratio between the median latency of the last and the middle window')
+    parser.add_argument('--max-memory-growth', type=int, default=64 * 1024,
+                        help='maximum growth of retained memory in bytes between the middle and the last window')
+    args = parser.parse_args()
+
+    app.logger.setLevel(logging.CRITICAL)
+    app.config['ANALYSIS_FRONTEND'] = args.frontend
+    app.config['ANALYSIS_CACHE'] = ''
+    if args.statements is not None:
+        script = generate_script(statements=args.statements)
+    else:
+        with open(args.script, 'r') as file:
+            script = file.read()
+    with open(os.path.join(basedir, 'knowledge_base', 'knowledge_base.json'), 'r') as file:
+        knowledge_base_json = json.load(file)
+    requirements = 'qiskit\nnumpy\n'
+    thresholds = [int(threshold) for threshold in args.thresholds.split(',')]
+
+    # Output of the splitting pipeline is irrelevant for the benchmark
+    output = sys.stdout
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if args.threads > 1:
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                return soak(args, executor, script, requirements, knowledge_base_json, thresholds, output)
+        return soak(args, None, script, requirements, knowledge_base_json, thresholds, output)
+
+
+def soak(args, executor, script, requirements, knowledge_base_json, thresholds, output):
+    # Splits of each threshold without concurrent jobs, which all later splits with the threshold have to match
+    expected = set(split(script, requirements, knowledge_base_json, threshold) for threshold in thresholds)
+
+    # Warm up caches of the interpreter and compiled knowledge bases before measuring
+    run_window(min(args.jobs, 20), executor, script, requirements, knowledge_base_json, thresholds)
+
+    tracemalloc.start()
+    windows = []
+    shapes = set()
+    window_size = max(args.jobs // args.windows, 1)
+    for window in range(args.windows):
+        latencies, window_shapes = run_window(window_size, executor, script, requirements, knowledge_base_json,
+                                              thresholds)
+        shapes.update(window_shapes)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        windows.append({'window': window, 'jobs': window_size, 'median_latency': statistics.median(latencies),
+                        'retained_memory': retained})
+        print(json.dumps(windows[-1]), file=output, flush=True)
+    tracemalloc.stop()
+
+    middle = windows[len(windows) // 2]
+    latency_growth = windows[-1]['median_latency'] / middle['median_latency']
+    memory_growth = windows[-1]['retained_memory'] - middle['retained_memory']
+    result = {'latency_growth': latency_growth, 'memory_growth': memory_growth,
+              'distinct_results': len(shapes)}
+    print(json.dumps(result), file=output)
+
+    failures = []
+    if latency_growth > args.max_latency_growth:
+        failures.append('latency per job grew by factor %.2f' % latency_growth)
+    if memory_growth > args.max_memory_growth:
+        failures.append('retained memory grew by %d bytes' % memory_growth)
+    if shapes != expected:
+        failures.append('splits of the same script differ: %s instead of %s' % (sorted(shapes), sorted(expected)))
+    for failure in failures:
+        print('FAILED: %s' % failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# ******************************************************************************
+#  Copyright (c) 2022 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+"""
+Benchmark suite timing and memory-profiling each stage of the splitting pipeline on generated hybrid scripts.
+Runs offline, i.e., without Redis, the database, or a running Flask application, and prints the results as JSON.
+Results of another commit can be passed as baseline to fail on stages which got slower.
+
+Usage: python -m benchmarks.suite [--statements 100,1000] [--depth 2] [--quantum-ratio 0.5] [--variables 10]
+                                  [--import-style from,alias,plain] [--frontend ast,redbaron] [--repeat 3]
+                                  [--output results.json] [--baseline results.json] [--max-slowdown 1.5]
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+basedir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "..")
+sys.path.insert(0, basedir)
+
+from app import app  # noqa: E402
+from app.script_splitting.flattener import flatten  # noqa: E402
+from app.script_splitting.liveness import LivenessAnalysis  # noqa: E402
+from app.script_splitting.script_analyzer import ScriptAnalyzer  # noqa: E402
+from app.script_splitting.script_handler import parse_qc_script, save_as_files  # noqa: E402
+from app.script_splitting.script_splitter import ScriptSplitter  # noqa: E402
+from benchmarks.generator import IMPORT_STYLES, generate_script  # noqa: E402
+
+STAGES = ['parse', 'flatten', 'get_labels', 'identify_code_blocks', 'compute_return_variables', 'compute_parameters',
+          'split_script', 'save_as_files']
+
+
+class StageRecorder:
+    """Measures the duration and, if memory is traced, the peak of additionally allocated memory of each stage."""
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.peak_memory = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            # Only count memory allocated by this stage, tracemalloc.reset_peak() is not available before Python 3.9
+            tracemalloc.clear_traces()
+        start = time.perf_counter()
+        yield
+        self.seconds[name] = time.perf_counter() - start
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_memory[name] = peak
+
+
+def run_pipeline(script, knowledge_base_json, recorder, result_folder):
+    """Run all stages of the pipeline like do_the_split and save_as_files do, but one stage after the other."""
+    with recorder.stage('parse'):
+        parsed_script = parse_qc_script(script)
+    with recorder.stage('flatten'):
+        flattened_script = flatten(parsed_script)
+    with recorder.stage('get_labels'):
+        labels = ScriptAnalyzer(flattened_script, knowledge_base_json['white_list'],
+                                knowledge_base_json['black_list']).get_labels()
+
+    splitter = ScriptSplitter(flattened_script, 'qiskit\nnumpy\n', labels)
+    with recorder.stage('identify_code_blocks'):
+        code_blocks = splitter.identify_code_blocks(flattened_script)
+    splitter.CODE_BLOCKS = code_blocks
+
+    # Hand-over analysis of all code blocks as done while generating the parts
+    with recorder.stage('compute_return_variables'):
+        if app.config['HANDOFF_ANALYSIS'] == 'liveness':
+            splitter.LIVENESS = LivenessAnalysis(flattened_script, labels, code_blocks)
+            order = splitter.LIVENESS.order
+        else:
+            order = [i for i, code_block in enumerate(code_blocks) if code_block]
+        for i in order:
+            splitter.context.all_possible_return_variables.extend(splitter.compute_return_variables(code_blocks[i]))
+    with recorder.stage('compute_parameters'):
+        for i in order:
+            splitter.compute_parameters(code_blocks[i])
+
+    with recorder.stage('split_script'):
+        script_parts = ScriptSplitter(flattened_script, 'qiskit\nnumpy\n', labels, code_blocks).split_script()
+    with recorder.stage('save_as_files'):
+        save_as_files(script_parts, os.path.basename(result_folder))
+    return len(script_parts['extracted_parts'])
+
+
+def run_case(case, repeat, knowledge_base_json):
+    app.config['ANALYSIS_FRONTEND'] = case['frontend']
+    script = generate_script(statements=case['statements'], depth=case['depth'], quantum_ratio=case['quantum_ratio'],
+                             variables=case['variables'], import_style=case['import_style'], seed=case['seed'])
+
+    with tempfile.TemporaryDirectory() as result_folder:
+        app.config['RESULT_FOLDER'] = result_folder
+
+        # Time without tracing memory, which slows down allocations considerably
+        timings = []
+        parts = None
+        for i in range(repeat):
+            recorder = StageRecorder(trace_memory=False)
+            parts = run_pipeline(script, knowledge_base_json, recorder, os.path.join(result_folder, 'run-%d' % i))
+            timings.append(recorder.seconds)
+
+        recorder = StageRecorder(trace_memory=True)
+        tracemalloc.start()
+        try:
+            run_pipeline(script, knowledge_base_json, recorder, os.path.join(result_folder, 'memory'))
+        finally:
+            tracemalloc.stop()
+
+    stages = {}
+    for stage in STAGES:
+        seconds = [timing[stage] for timing in timings]
+        stages[stage] = {'seconds': statistics.median(seconds), 'min_seconds': min(seconds),
+                         'peak_memory': recorder.peak_memory[stage]}
+    return {'case': case, 'script_size': len(script), 'parts': parts, 'stages': stages}
+
+
+def get_environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=basedir, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'handoff_analysis': app.config['HANDOFF_ANALYSIS'], 'partitioning': app.config['PARTITIONING'],
+            'cost_model': app.config['COST_MODEL']}
+
+
+def compare(results, baseline, max_slowdown, min_seconds):
+    """Stages of the results which are slower than in the baseline by more than the given factor."""
+    baseline_cases = {json.dumps(result['case'], sort_keys=True): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        baseline_result = baseline_cases.get(json.dumps(result['case'], sort_keys=True))
+        if baseline_result is None:
+            continue
+        for stage, values in result['stages'].items():
+            baseline_values = baseline_result['stages'].get(stage)
+            if baseline_values is None or max(values['seconds'], baseline_values['seconds']) < min_seconds:
+                continue
+            slowdown = values['seconds'] / max(baseline_values['seconds'], 1e-9)
+            if slowdown > max_slowdown:
+                regressions.append({'case': result['case'], 'stage': stage, 'slowdown': slowdown})
+    return regressions
+
+
+def parse_list(value, value_type):
+    return [value_type(element) for element in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--statements', default='100,1000', help='comma-separated numbers of statements')
+    parser.add_argument('--depth', default='2', help='comma-separated maximum nesting depths')
+    parser.add_argument('--quantum-ratio', default='0.5', help='comma-separated ratios of quantum statements')
+    parser.add_argument('--variables', default='10', help='comma-separated numbers of distinct variables')
+    parser.add_argument('--import-style', default='from', help='comma-separated import styles of %s'
+                                                               % sorted(IMPORT_STYLES))
+    parser.add_argument('--frontend', default='ast', help='comma-separated front-ends (ast, redbaron)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs per case')
+    parser.add_argument('--output', help='file to write the results to instead of stdout')
+    parser.add_argument('--baseline', help='results of a previous run to compare with')
+    parser.add_argument('--max-slowdown', type=float, default=1.5,
+                        help='maximum ratio between the duration of a stage and its duration in the baseline')
+    parser.add_argument('--min-seconds', type=float, default=0.01,
+                        help='ignore stages faster than this in both runs when comparing with the baseline')
+    args = parser.parse_args()
+
+    app.logger.setLevel(logging.CRITICAL)
+    app.config['ANALYSIS_CACHE'] = ''
+    with open(os.path.join(basedir, 'knowledge_base', 'knowledge_base.json'), 'r') as file:
+        knowledge_base_json = json.load(file)
+
+    cases = [{'statements': statements, 'depth': depth, 'quantum_ratio': quantum_ratio, 'variables': variables,
+              'import_style': import_style, 'frontend': frontend, 'seed': args.seed}
+             for statements, depth, quantum_ratio, variables, import_style, frontend in itertools.product(
+                 parse_list(args.statements, int), parse_list(args.depth, int),
+                 parse_list(args.quantum_ratio, float), parse_list(args.variables, int),
+                 parse_list(args.import_style, str), parse_list(args.frontend, str))]
+
+    results = {'environment': get_environment(), 'results': []}
+    output = sys.stdout
+    # Output of the splitting pipeline, e.g., of autoflake, is irrelevant for the benchmark
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for case in cases:
+            result = run_case(case, args.repeat, knowledge_base_json)
+            results['results'].append(result)
+            print('%s: %s' % (json.dumps(case, sort_keys=True), ', '.join(
+                '%s %.3fs' % (stage, values['seconds']) for stage, values in result['stages'].items())),
+                  file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, output, indent=2)
+        print(file=output)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.max_slowdown, args.min_seconds)
+        for regression in regressions:
+            print('REGRESSION: %s of %s is %.2f times slower' % (regression['stage'],
+                                                                json.dumps(regression['case'], sort_keys=True),
+                                                                regression['slowdown']), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())